@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, root_dir)
+
+from src.model.HandTracker import HandTracker
+from src.model.DepthEstimator import DepthEstimator
+
+
+def record_samples(
+    tracker: HandTracker,
+    cap: cv2.VideoCapture,
+    depths: list,
+    frames_per_depth: int = 30,
+) -> tuple:
+    """
+    Interactively record the landmarks of the hand at known depths.
+
+    Args:
+        tracker (HandTracker): The hand tracker.
+        cap (cv2.VideoCapture): The webcam.
+        depths (list): Depths, in cm, at which the hand is recorded.
+        frames_per_depth (int): Number of detections recorded at each depth.
+
+    Returns:
+        tuple: Landmarks with shape (samples, 21, 3) and the depth of each sample.
+    """
+    landmarks, labels = [], []
+
+    for depth in depths:
+        input("Place your hand at {} cm from the camera and press Enter...".format(depth))
+
+        recorded, last_result = 0, tracker.DETECTION_RESULT
+        while recorded < frames_per_depth:
+            success, image = cap.read()
+            if not success:
+                sys.exit("ERROR: Unable to read from the webcam. Please verify your webcam settings.")
+
+            cv2.flip(image, 1, image)
+            image = tracker.detect(image, draw=True)
+            cv2.imshow("calibration", image)
+            cv2.waitKey(1)
+
+            # Only keep new detection results
+            if tracker.DETECTION_RESULT is not last_result:
+                last_result = tracker.DETECTION_RESULT
+                hand = tracker.get_landmarks_array()
+                if hand is not None:
+                    landmarks.append(hand)
+                    labels.append(depth)
+                    recorded += 1
+
+    return np.array(landmarks), np.array(labels, dtype=np.float64)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Calibrate the hand depth estimation.")
+    parser.add_argument(
+        "--clip",
+        help="Recorded clip (.npz with landmarks, depths, width and height) to fit instead of recording a new one",
+    )
+    parser.add_argument(
+        "--output",
+        default=os.path.join(root_dir, "res", "calibration", "depth.json"),
+        help="Path of the calibration file",
+    )
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument(
+        "--depths",
+        type=float,
+        nargs="+",
+        default=[20, 30, 40, 50, 60, 70, 80],
+        help="Depths, in cm, at which the hand is recorded",
+    )
+    args = parser.parse_args()
+
+    if args.clip is not None:
+        clip = np.load(args.clip)
+        landmarks, depths = clip["landmarks"], clip["depths"]
+        width, height = int(clip["width"]), int(clip["height"])
+    else:
+        tracker = HandTracker(
+            model=os.path.join(root_dir, "res", "hand_landmarker.task"),
+            num_hands=1,
+            min_hand_detection_confidence=0.5,
+            min_hand_presence_confidence=0.5,
+            min_tracking_confidence=0.5,
+        )
+        cap = cv2.VideoCapture(0)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, args.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, args.height)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        try:
+            landmarks, depths = record_samples(tracker, cap, args.depths)
+        finally:
+            tracker.detector.close()
+            cap.release()
+            cv2.destroyAllWindows()
+
+        # Keep the recording to refit the model later
+        clip_path = os.path.splitext(args.output)[0] + "_{}.npz".format(time.strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(os.path.dirname(clip_path) or ".", exist_ok=True)
+        np.savez_compressed(clip_path, landmarks=landmarks, depths=depths, width=width, height=height)
+        print("Recording saved to {}".format(clip_path))
+
+    estimator = DepthEstimator()
+    estimator.fit(landmarks, depths, width, height)
+    estimator.save(args.output)
+
+    error = np.abs(estimator.estimate(landmarks, width, height) - depths)
+    print("Calibration saved to {}".format(args.output))
+    print("Mean error: {:.1f} cm, max error: {:.1f} cm".format(error.mean(), error.max()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import os
+import sys
+import time
+import argparse
+import threading
+
+import serial
+import serial.tools.list_ports
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.sys.path.insert(0, root_dir)
+
+from pyfirmata2 import Arduino
+from src.control.RoboArm import RoboArm
+from src.utils.Config import ArmConfig, ConfigStore
+from src.utils.Metrics import metrics
+
+
+def discover_ports() -> list:
+    """
+    Find the serial ports that may have a Firmata board, using the same rules as Arduino.AUTODETECT.
+
+    Returns:
+        list: Sorted list of the serial port names.
+    """
+    ports = []
+    for port in serial.tools.list_ports.comports():
+        if sys.platform.startswith("linux"):
+            if "ACM" in port.device or "usbserial" in port.device:
+                ports.append(port.device)
+        elif sys.platform == "win32" or port.vid is not None:
+            ports.append(port.device)
+    return sorted(ports)
+
+
+class ArmWorker(threading.Thread):
+    """
+    Thread owning the connection to one board and its RoboArm.
+
+    Commands are written to a latest-wins slot, so a slow or disconnected board never
+    delays the others and never replays old commands after reconnecting. The worker
+    reconnects with an exponential backoff whenever the serial link fails.
+
+    Attributes:
+        port (str): Serial port of the board
+        config (ArmConfig): Configuration of the arm
+        state (str): "connecting", "connected" or "stopped"
+        arm (RoboArm): The arm, None while disconnected
+        reconnects (int): Number of reconnections after a failure
+
+    Methods:
+        submit(base, reach, height, claw): Set the next pose of the arm
+        disconnect(): Force a reconnection, e.g. when the port disappears
+        stop(): Stop the worker and close the board
+    """
+
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    STOPPED = "stopped"
+
+    def __init__(
+        self,
+        port: str,
+        config: ArmConfig = None,
+        board_factory=Arduino,
+        min_backoff: float = 0.5,
+        max_backoff: float = 10.0,
+    ) -> None:
+        """
+        Initialize the ArmWorker class.
+
+        Args:
+            port (str): Serial port of the board.
+            config (ArmConfig): Configuration of the arm.
+            board_factory (function): Function creating the board from the port. Defaults to Arduino.
+            min_backoff (float): First delay, in seconds, before reconnecting.
+            max_backoff (float): Maximum delay, in seconds, before reconnecting.
+        """
+        super().__init__(name="ArmWorker-{}".format(port), daemon=True)
+        self.port = port
+        self.config = config
+        self.board_factory = board_factory
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self.state = self.CONNECTING
+        self.arm = None
+        self.board = None
+        self.reconnects = 0
+
+        self._condition = threading.Condition()
+        self._slot = None
+        self._stopping = False
+        self._disconnect = False
+
+    def submit(self, base: float, reach: float, height: float, claw: float) -> None:
+        """
+        Set the next pose of the arm, replacing a pose not applied yet
+
+        Args:
+            base (float): Base servo angle
+            reach (float): Reach servo angle
+            height (float): Height servo angle
+            claw (float): Claw servo angle
+
+        Returns:
+            None
+        """
+        with self._condition:
+            if self._slot is not None:
+                metrics.inc("fleet_commands_replaced_total")
+            self._slot = (base, reach, height, claw)
+            self._condition.notify()
+
+    def disconnect(self) -> None:
+        """Force a reconnection, e.g. when the port disappears"""
+        with self._condition:
+            self._disconnect = True
+            self._condition.notify()
+
+    def stop(self) -> None:
+        """Stop the worker and close the board"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+
+    def _connect(self) -> None:
+        self.state = self.CONNECTING
+        self.board = self.board_factory(self.port)
+        self.arm = RoboArm(self.board, self.config)
+        self.state = self.CONNECTED
+
+    def _close(self) -> None:
+        try:
+            if self.arm is not None:
+                self.arm.close()
+            if self.board is not None:
+                self.board.exit()
+        except Exception:
+            pass
+        self.arm, self.board = None, None
+
+    def run(self) -> None:
+        backoff = self.min_backoff
+        while not self._stopping:
+            try:
+                self._connect()
+                backoff = self.min_backoff
+                self._serve()
+            except OSError as e:
+                print("Board on {} disconnected: {}".format(self.port, e))
+            except Exception as e:
+                print("Unable to connect to the board on {}: {}".format(self.port, e))
+
+            self._close()
+            if self._stopping:
+                break
+
+            self.state = self.CONNECTING
+            self.reconnects += 1
+            metrics.inc("fleet_reconnects_total")
+            with self._condition:
+                self._condition.wait_for(lambda: self._stopping, timeout=backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+        self._close()
+        self.state = self.STOPPED
+
+    def _serve(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._slot is not None or self._stopping or self._disconnect)
+                if self._stopping:
+                    return
+                if self._disconnect:
+                    self._disconnect = False
+                    raise IOError("port {} disappeared".format(self.port))
+                pose, self._slot = self._slot, None
+
+            self.arm.control_servos(*pose)
+            metrics.inc("fleet_commands_applied_total")
+
+
+class FleetSupervisor:
+    """
+    Class to supervise one RoboArm per Firmata board connected to this computer.
+
+    Every board runs in its own ArmWorker thread, so the 2-second warm-up, a slow
+    serial link or a loose cable only affect that arm. The serial ports are scanned
+    periodically: new boards get a worker and the workers of vanished ports reconnect
+    when the port comes back.
+
+    Attributes:
+        workers (dict): Dictionary of serial ports and their ArmWorker
+        discovery_interval (float): Seconds between two scans of the serial ports
+
+    Methods:
+        start(): Start the workers of the current boards and the discovery thread
+        discover(): Scan the serial ports once
+        submit(port, base, reach, height, claw): Set the next pose of one arm
+        broadcast(base, reach, height, claw): Set the next pose of every arm
+        states(): Get the connection state of every arm
+        stop(): Stop every worker
+    """
+
+    def __init__(
+        self,
+        config: ArmConfig = None,
+        board_factory=Arduino,
+        discovery_interval: float = 5.0,
+        ports: list = None,
+    ) -> None:
+        """
+        Initialize the FleetSupervisor class.
+
+        Args:
+            config (ArmConfig): Configuration shared by the arms.
+            board_factory (function): Function creating a board from a port. Defaults to Arduino.
+            discovery_interval (float): Seconds between two scans of the serial ports.
+            ports (list): Fixed list of ports. The ports are discovered automatically if None.
+        """
+        self.config = config
+        self.board_factory = board_factory
+        self.discovery_interval = discovery_interval
+        self.ports = ports
+
+        self.workers = {}
+        self._workers_lock = threading.Lock()  # The discovery thread adds workers while the caller iterates them
+        self._stop = threading.Event()
+        self._thread = None
+
+    def discover(self) -> None:
+        """Scan the serial ports once, adding workers for new boards"""
+        ports = self.ports if self.ports is not None else discover_ports()
+        with self._workers_lock:
+            for port in ports:
+                if port not in self.workers:
+                    worker = ArmWorker(port, self.config, self.board_factory)
+                    self.workers[port] = worker
+                    worker.start()
+        workers = self._workers()
+
+        # Boards unplugged while idle are only noticed on the next write, force the reconnection
+        if self.ports is None:
+            for port, worker in workers:
+                if port not in ports and worker.state == ArmWorker.CONNECTED:
+                    worker.disconnect()
+
+        metrics.set_gauge(
+            "fleet_arms_connected",
+            sum(worker.state == ArmWorker.CONNECTED for _, worker in workers),
+        )
+
+    def _workers(self) -> list:
+        with self._workers_lock:
+            return list(self.workers.items())
+
+    def _discovery_loop(self) -> None:
+        while not self._stop.wait(self.discovery_interval):
+            self.discover()
+
+    def start(self) -> None:
+        """Start the workers of the current boards and the discovery thread"""
+        self.discover()
+        self._thread = threading.Thread(target=self._discovery_loop, name="FleetDiscovery", daemon=True)
+        self._thread.start()
+
+    def submit(self, port: str, base: float, reach: float, height: float, claw: float) -> None:
+        """
+        Set the next pose of one arm
+
+        Args:
+            port (str): Serial port of the arm
+            base (float): Base servo angle
+            reach (float): Reach servo angle
+            height (float): Height servo angle
+            claw (float): Claw servo angle
+
+        Returns:
+            None
+        """
+        with self._workers_lock:
+            worker = self.workers[port]
+        worker.submit(base, reach, height, claw)
+
+    def broadcast(self, base: float, reach: float, height: float, claw: float) -> None:
+        """Set the next pose of every arm"""
+        for _, worker in self._workers():
+            worker.submit(base, reach, height, claw)
+
+    def states(self) -> dict:
+        """
+        Get the connection state of every arm
+
+        Returns:
+            dict: Dictionary of serial ports and their state
+        """
+        return {port: worker.state for port, worker in self._workers()}
+
+    def stop(self) -> None:
+        """Stop every worker"""
+        self._stop.set()
+        workers = self._workers()
+        for _, worker in workers:
+            worker.stop()
+        for _, worker in workers:
+            worker.join(timeout=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Supervise every RoboArm connected to this computer.")
+    parser.add_argument("--ports", nargs="+", help="Fixed serial ports. Discovered automatically by default")
+    parser.add_argument("--config", default=os.path.join(root_dir, "res", "config.json"))
+    parser.add_argument("--profile", default=os.environ.get("ROBOARM_PROFILE"))
+    args = parser.parse_args()
+
+    config = ConfigStore(args.config, args.profile).config
+    supervisor = FleetSupervisor(config.arm, ports=args.ports)
+    supervisor.start()
+
+    try:
+        while True:
+            time.sleep(supervisor.discovery_interval)
+            print(supervisor.states())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import os
+import time
+import socket
+import struct
+import asyncio
+import argparse
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.sys.path.insert(0, root_dir)
+
+from src.control.RoboArm import RoboArm
+from src.utils.Metrics import metrics
+
+# Packet layout, little-endian:
+#   magic (2s), version (B), type (B), sequence (I), timestamp in us (Q),
+#   base, reach, height, claw in tenths of degree (4h)
+# State packets append a flags byte (B).
+MAGIC = b"RA"
+VERSION = 1
+
+POSE = 1
+SUBSCRIBE = 2
+UNSUBSCRIBE = 3
+STATE = 4
+
+POSE_STRUCT = struct.Struct("<2sBBIQ4h")
+STATE_STRUCT = struct.Struct("<2sBBIQ4hB")
+
+STATE_SETTLED = 0x01
+STATE_WATCHDOG = 0x02
+
+SERVO_NAMES = ["Base", "Reach", "Height", "Claw"]
+
+
+def pack_pose(sequence: int, base: float, reach: float, height: float, claw: float, timestamp_us: int = None) -> bytes:
+    """
+    Pack a pose command.
+
+    Args:
+        sequence (int): Sequence number of the packet, incremented by the client for every pose.
+        base (float): Base servo angle.
+        reach (float): Reach servo angle.
+        height (float): Height servo angle.
+        claw (float): Claw servo angle.
+        timestamp_us (int): Time of the pose in microseconds. Defaults to time.time().
+
+    Returns:
+        bytes: The packet.
+    """
+    if timestamp_us is None:
+        timestamp_us = time.time_ns() // 1000
+    return POSE_STRUCT.pack(
+        MAGIC,
+        VERSION,
+        POSE,
+        sequence & 0xFFFFFFFF,
+        timestamp_us,
+        *(int(round(angle * 10)) for angle in (base, reach, height, claw)),
+    )
+
+
+def pack_control(packet_type: int) -> bytes:
+    """Pack a SUBSCRIBE or UNSUBSCRIBE request"""
+    return POSE_STRUCT.pack(MAGIC, VERSION, packet_type, 0, 0, 0, 0, 0, 0)
+
+
+def unpack_state(data: bytes) -> tuple:
+    """
+    Unpack a state packet.
+
+    Args:
+        data (bytes): The packet.
+
+    Returns:
+        tuple: Sequence number, timestamp in microseconds, list of the estimated angles and the flags.
+    """
+    magic, version, packet_type, sequence, timestamp_us, *angles, flags = STATE_STRUCT.unpack(data)
+    if magic != MAGIC or version != VERSION or packet_type != STATE:
+        raise ValueError("Not a state packet")
+    return sequence, timestamp_us, [angle / 10 for angle in angles], flags
+
+
+class RemoteServer(asyncio.DatagramProtocol):
+    """
+    Class to drive a RoboArm from a stream of poses received over UDP.
+
+    Poses are written to a latest-wins slot and applied as soon as possible, so a
+    slow serial link never queues old commands. Packets older than the last applied
+    sequence of the same client are dropped. If no pose arrives for watchdog_timeout
+    seconds the arm moves back to its home position. Clients can subscribe to the
+    estimated state of the arm, streamed at state_rate packets per second.
+
+    Attributes:
+        arm (RoboArm): The controlled arm
+        watchdog_timeout (float): Seconds without a pose before homing the arm
+        max_age (float): Maximum age, in seconds, of a pose according to its timestamp. Disabled if None
+        state_rate (float): State packets sent per second to the subscribers
+        homing_speed (float): Speed of the homing motion, in degrees per second
+        subscriber_timeout (float): Seconds a subscription lasts without being renewed
+
+    Methods:
+        start(host, port): Start the server
+        stop(): Stop the server
+        serve_forever(host, port): Run the server until cancelled
+    """
+
+    def __init__(
+        self,
+        arm: RoboArm,
+        watchdog_timeout: float = 0.5,
+        max_age: float = None,
+        state_rate: float = 50,
+        homing_speed: float = 60,
+        subscriber_timeout: float = 10,
+    ) -> None:
+        """
+        Initialize the RemoteServer class.
+
+        Args:
+            arm (RoboArm): The controlled arm.
+            watchdog_timeout (float): Seconds without a pose before homing the arm.
+            max_age (float): Maximum age, in seconds, of a pose according to its timestamp. Requires synchronized clocks. Disabled if None.
+            state_rate (float): State packets sent per second to the subscribers.
+            homing_speed (float): Speed of the homing motion, in degrees per second.
+            subscriber_timeout (float): Seconds a subscription lasts without being renewed.
+        """
+        self.arm = arm
+        self.watchdog_timeout = watchdog_timeout
+        self.max_age = max_age
+        self.state_rate = state_rate
+        self.homing_speed = homing_speed
+        self.subscriber_timeout = subscriber_timeout
+
+        self.transport = None
+        self._slot = None
+        self._new_pose = None
+        self._tasks = []
+        self._last_sequence = {}
+        self._subscribers = {}
+        self._last_pose_time = None
+        self._watchdog_tripped = False
+        self._state_sequence = 0
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        metrics.inc("remote_packets_total")
+        if len(data) != POSE_STRUCT.size:
+            metrics.inc("remote_packets_invalid_total")
+            return
+        magic, version, packet_type, sequence, timestamp_us, *angles = POSE_STRUCT.unpack(data)
+        if magic != MAGIC or version != VERSION:
+            metrics.inc("remote_packets_invalid_total")
+            return
+
+        if packet_type == SUBSCRIBE:
+            self._subscribers[addr] = time.monotonic()
+        elif packet_type == UNSUBSCRIBE:
+            self._subscribers.pop(addr, None)
+        elif packet_type == POSE:
+            # Drop duplicated and reordered packets, with wrap-around of the sequence
+            last = self._last_sequence.get(addr)
+            if last is not None and not 0 < (sequence - last) & 0xFFFFFFFF < 0x80000000:
+                metrics.inc("remote_packets_out_of_order_total")
+                return
+            self._last_sequence[addr] = sequence
+
+            if self.max_age is not None and time.time() - timestamp_us / 1e6 > self.max_age:
+                metrics.inc("remote_packets_stale_total")
+                return
+
+            self._slot = [angle / 10 for angle in angles]
+            self._last_pose_time = time.monotonic()
+            self._new_pose.set()
+        else:
+            metrics.inc("remote_packets_invalid_total")
+
+    async def _apply_poses(self) -> None:
+        while True:
+            await self._new_pose.wait()
+            self._new_pose.clear()
+            pose, self._slot = self._slot, None
+            if pose is None:
+                continue
+            self._watchdog_tripped = False
+            self.arm.control_servos(*pose)
+            metrics.inc("remote_poses_applied_total")
+
+    async def _watchdog(self) -> None:
+        period = self.watchdog_timeout / 4
+        while True:
+            await asyncio.sleep(period)
+            if self._last_pose_time is None:
+                continue
+            if time.monotonic() - self._last_pose_time < self.watchdog_timeout:
+                continue
+            if not self._watchdog_tripped:
+                self._watchdog_tripped = True
+                metrics.inc("remote_watchdog_trips_total")
+            self.arm.home_step(max(1, self.homing_speed * period))
+
+    async def _stream_state(self) -> None:
+        period = 1 / self.state_rate
+        while True:
+            await asyncio.sleep(period)
+            if not self._subscribers:
+                continue
+
+            now = time.monotonic()
+            for addr, renewed in list(self._subscribers.items()):
+                if now - renewed > self.subscriber_timeout:
+                    del self._subscribers[addr]
+
+            flags = (STATE_SETTLED if self.arm.settled() else 0) | (
+                STATE_WATCHDOG if self._watchdog_tripped else 0
+            )
+            self._state_sequence = (self._state_sequence + 1) & 0xFFFFFFFF
+            packet = STATE_STRUCT.pack(
+                MAGIC,
+                VERSION,
+                STATE,
+                self._state_sequence,
+                time.time_ns() // 1000,
+                *(int(round(self.arm.servos[name].position() * 10)) for name in SERVO_NAMES),
+                flags,
+            )
+            for addr in self._subscribers:
+                self.transport.sendto(packet, addr)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 9500) -> None:
+        """
+        Start the server
+
+        Args:
+            host (str): Address to bind. Defaults to the loopback interface
+            port (int): UDP port. Use 0 to pick a free port
+
+        Returns:
+            None
+        """
+        loop = asyncio.get_running_loop()
+        self._new_pose = asyncio.Event()
+        await loop.create_datagram_endpoint(lambda: self, local_addr=(host, port))
+        self._tasks = [
+            asyncio.create_task(self._apply_poses()),
+            asyncio.create_task(self._watchdog()),
+            asyncio.create_task(self._stream_state()),
+        ]
+
+    @property
+    def address(self) -> tuple:
+        """Address the server is bound to"""
+        return self.transport.get_extra_info("sockname")
+
+    def stop(self) -> None:
+        """Stop the server"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self.transport is not None:
+            self.transport.close()
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 9500) -> None:
+        """
+        Run the server until cancelled
+
+        Args:
+            host (str): Address to bind
+            port (int): UDP port
+
+        Returns:
+            None
+        """
+        await self.start(host, port)
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            self.stop()
+
+
+class RemoteClient:
+    """
+    Class to send poses to a RemoteServer and receive the state of the arm.
+
+    Methods:
+        send_pose(base, reach, height, claw): Send a pose
+        subscribe(): Subscribe to the state of the arm
+        unsubscribe(): Cancel the subscription
+        receive_state(timeout=1.0): Wait for a state packet
+        close(): Close the socket
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9500) -> None:
+        """
+        Initialize the RemoteClient class.
+
+        Args:
+            host (str): Address of the server.
+            port (int): UDP port of the server.
+        """
+        self.address = (host, port)
+        self.sequence = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send_pose(self, base: float, reach: float, height: float, claw: float) -> None:
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        self.sock.sendto(pack_pose(self.sequence, base, reach, height, claw), self.address)
+
+    def subscribe(self) -> None:
+        self.sock.sendto(pack_control(SUBSCRIBE), self.address)
+
+    def unsubscribe(self) -> None:
+        self.sock.sendto(pack_control(UNSUBSCRIBE), self.address)
+
+    def receive_state(self, timeout: float = 1.0) -> tuple:
+        """
+        Wait for a state packet
+
+        Args:
+            timeout (float): Seconds to wait
+
+        Returns:
+            tuple: Sequence number, timestamp in microseconds, list of the estimated angles and the flags
+        """
+        self.sock.settimeout(timeout)
+        data, _ = self.sock.recvfrom(STATE_STRUCT.size)
+        return unpack_state(data)
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def main() -> None:
+    from pyfirmata2 import Arduino
+    from src.utils.Config import ConfigStore
+
+    parser = argparse.ArgumentParser(description="Drive the RoboArm from poses received over UDP.")
+    parser.add_argument("--port", default=Arduino.AUTODETECT, help="Port of the Arduino board")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--udp-port", type=int, default=9500)
+    parser.add_argument("--config", default=os.path.join(root_dir, "res", "config.json"))
+    parser.add_argument("--profile", default=os.environ.get("ROBOARM_PROFILE"))
+    args = parser.parse_args()
+
+    config = ConfigStore(args.config, args.profile).config
+    board = Arduino(args.port)
+    arm = RoboArm(board, config.arm)
+    server = RemoteServer(arm, homing_speed=config.control.homing_speed)
+
+    try:
+        asyncio.run(server.serve_forever(args.host, args.udp_port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        arm.close()
+        board.exit()
+
+
+if __name__ == "__main__":
+    main()
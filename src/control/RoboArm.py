@@ -5,6 +5,8 @@ os.sys.path.insert(0, root_dir)
 
 from pyfirmata2 import Arduino
 from src.control.Servo import Servo
+from src.utils.Metrics import metrics
+from src.utils.Config import ArmConfig
 
 
 class RoboArm:
@@ -13,52 +15,152 @@ class RoboArm:
 
     Attributes:
         servos (dict): Dictionary of servos with the name as the key and the servo object as the value
-        PIN_BASE (int): Pin number for the base servo
-        PIN_REACH (int): Pin number for the reach servo
-        PIN_HEIGHT (int): Pin number for the height servo
-        PIN_CLAW (int): Pin number for the claw servo
-        SERVOS_LIMITS (dict): Dictionary of servo names and their limits as a list. The order is Base, Reach, Height, Claw
+        config (ArmConfig): Pins, limits, home angles and Height/Reach coupling of the servos
 
     Methods:
+        initialize_sensors(): Apply the limits and move the servos to their home angles
+        apply_config(config: ArmConfig): Apply new limits and coupling without restarting
         control_servos(base: int, reach: int, height: int, claw: int): Control the servos by name
+        home_angle(name: str): Get the home angle of a servo
+        home_step(max_step: float): Move the servos one step towards their home angles
+        advance(): Move the speed-limited servos one step towards their targets
+        hold(): Stop the servos at their estimated positions
+        settled(): Check whether all the servos reached their commanded angles
         print_servo_info(name: str): Print the servo info to the console
         get_servo_info(name: str): Get the servo info as a string
         close(): Close all the servos
     """
 
-    PIN_BASE = 2
-    PIN_REACH = 3
-    PIN_HEIGHT = 4
-    PIN_CLAW = 5
-
-    SERVOS_LIMITS = {
-        "Base": [10, 140],
-        "Reach": [60, 160],
-        "Height": [70, 170],
-        "Claw": [100, 170],
-    }
-
-    ANGLE_CORRECTION_A = -0.75
-    ANGLE_CORRECTION_B = 165
+    def __init__(self, board: Arduino, config: ArmConfig = None) -> None:
+        """
+        Initialize the RoboArm class.
 
-    def __init__(self, board: Arduino) -> None:
+        Args:
+            board (Arduino): The Arduino board.
+            config (ArmConfig): Configuration of the servos. Defaults to the RoboCore wiring.
+        """
+        self.config = config if config is not None else ArmConfig()
         self.servos = {
-            "Base": Servo(board, self.PIN_BASE),
-            "Reach": Servo(board, self.PIN_REACH),
-            "Height": Servo(board, self.PIN_HEIGHT),
-            "Claw": Servo(board, self.PIN_CLAW),
+            name: Servo(board, servo.pin, servo.slew_rate, servo.max_speed)
+            for name, servo in self.config.servos.items()
         }
+
+        # Position feedback through the Firmata analog sampling
+        feedback = False
+        for name, servo in self.config.servos.items():
+            if servo.feedback_pin is not None:
+                self.servos[name].attach_feedback(servo.feedback_pin, servo.feedback_range)
+                feedback = True
+        if feedback:
+            board.samplingOn()
+
         self.initialize_sensors()
 
     def initialize_sensors(self) -> None:
-        for name, limits in self.SERVOS_LIMITS.items():
-            self.servos[name].set_limit(0, limits[0])
-            self.servos[name].set_limit(1, limits[1])
-            if name == "Base":
-                self.servos[name].attach(60)
-            else:
-                self.servos[name].attach()
+        for name, servo in self.config.servos.items():
+            self.servos[name].set_limit(0, servo.limits[0])
+            self.servos[name].set_limit(1, servo.limits[1])
+            self.servos[name].attach(self.home_angle(name))
+
+    def apply_config(self, config: ArmConfig) -> None:
+        """
+        Apply new limits, home angles and coupling without moving the servos to
+        their home angles. Pin changes require a restart.
+
+        Args:
+            config (ArmConfig): The new configuration
+
+        Returns:
+            None
+        """
+        for name, servo in config.servos.items():
+            if servo.pin != self.config.servos[name].pin:
+                print("The pin of the {} servo changes after a restart".format(name))
+            self.servos[name].set_limit(0, servo.limits[0])
+            self.servos[name].set_limit(1, servo.limits[1])
+            self.servos[name].estimator.slew_rate = servo.slew_rate
+            self.servos[name].max_speed = servo.max_speed
+            if servo.feedback_range is not None:
+                self.servos[name].estimator.feedback_range = servo.feedback_range
+        self.config = config
+
+        # Keep the current angles inside the new limits
+        for name, servo in self.servos.items():
+            self.control_servo(name, servo.read())
+
+    def home_angle(self, name: str) -> int:
+        """
+        Get the home angle of a servo
+
+        Args:
+            name (str): Name of the servo
+
+        Returns:
+            int: Home angle of the servo
+        """
+        return self.config.servos[name].home_angle()
+
+    def home_step(self, max_step: float) -> int:
+        """
+        Move the servos one step towards their home angles, limiting the motion
+        of each servo to max_step degrees. A servo still more than max_step
+        degrees away from its last command is not commanded again.
 
+        Args:
+            max_step (float): Maximum angle change of each servo in this step
+
+        Returns:
+            int: Number of servos written or still moving. Zero once the arm is at home
+        """
+        pending = 0
+        for name, servo in self.servos.items():
+            current = servo.read()
+            delta = self.home_angle(name) - current
+            if delta == 0:
+                continue
+            if not servo.settled(max_step):
+                pending += 1
+                continue
+            delta = max(-max_step, min(delta, max_step))
+            self.control_servo(name, int(round(current + delta)))
+            if servo.read() != current:
+                pending += 1
+        return pending
+
+    def advance(self) -> int:
+        """
+        Move the speed-limited servos one step towards their last requested angles
+
+        Returns:
+            int: Number of servos still short of their targets
+        """
+        pending = 0
+        for servo in self.servos.values():
+            if servo.target is not None and servo.target != servo.angle:
+                servo.write(servo.target)
+                pending += servo.target != servo.angle
+        return pending
+
+    def hold(self) -> None:
+        """
+        Stop the servos at their estimated positions, cancelling the motions in progress
+
+        Returns:
+            None
+        """
+        for servo in self.servos.values():
+            servo.write(int(round(servo.position())))
+
+    def settled(self) -> bool:
+        """
+        Check whether all the servos reached their commanded angles
+
+        Returns:
+            bool: Whether all the servos are settled
+        """
+        return all(servo.settled() for servo in self.servos.values())
+
+    @metrics.timed("robo_arm_control_servos_seconds")
     def control_servos(self, base: int, reach: int, height: int, claw: int) -> None:
         """
         Control a servo by name
@@ -89,18 +191,23 @@ class RoboArm:
             None
         """
         if name in self.servos:
+            # The coupling is checked against both the command and the estimated position of
+            # the other servo, the more restrictive bound wins so the arm stays in its envelope
+            # while the other servo is still moving and once it arrives
             if name == "Height":
-                max_angle = self.servos["Reach"].read()
-                max_angle = (
-                    float(max_angle * self.ANGLE_CORRECTION_A) + self.ANGLE_CORRECTION_B
+                reach = self.servos["Reach"]
+                max_angle = max(
+                    float(position * self.config.angle_correction_a) + self.config.angle_correction_b
+                    for position in (reach.read(), reach.position())
                 )
                 if angle < max_angle:
                     angle = max_angle
             elif name == "Reach":
-                max_angle = self.servos["Height"].read()
-                max_angle = (
-                    float(max_angle) - self.ANGLE_CORRECTION_B
-                ) / self.ANGLE_CORRECTION_A
+                height = self.servos["Height"]
+                max_angle = max(
+                    (float(position) - self.config.angle_correction_b) / self.config.angle_correction_a
+                    for position in (height.read(), height.position())
+                )
                 if angle < max_angle:
                     angle = max_angle
             self.servos[name].write(angle)
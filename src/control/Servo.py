@@ -1,4 +1,12 @@
+import os
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, root_dir)
+
 from pyfirmata2 import Arduino
+from src.utils.Metrics import metrics
+from src.control.ServoEstimator import ServoEstimator
 
 
 class Servo:
@@ -8,6 +16,11 @@ class Servo:
     Attributes:
         ROBOSERVO_MIN (int): Index for the minimum angle of the servo
         ROBOSERVO_MAX (int): Index for the maximum angle of the servo
+        MESSAGE_BYTES (int): Size of the Firmata analog message sent on each write
+        MAX_STEP_TIME (float): Longest time, in seconds, credited to a speed-limited step
+        estimator (ServoEstimator): Estimation of the actual position of the servo
+        max_speed (float): Maximum speed of the commands, in degrees per second. Unlimited if None
+        target (float): Last angle requested, reached later when the speed is limited
 
     Methods:
         get_limit(index): Get the limit of the servo at the given index
@@ -18,25 +31,41 @@ class Servo:
         set_max(angle): Set the maximum angle of the servo
         get_min(): Get the minimum angle of the servo
         set_min(angle): Set the minimum angle of the servo
-        write(angle): Write the given angle to the servo
-        read(): Read the current angle of the servo
+        write(angle): Write the given angle to the servo, limited by max_speed
+        read(): Read the last angle written to the servo
+        position(): Get the estimated actual angle of the servo
+        settled(tolerance=None): Check whether the servo reached the last angle written
+        attach_feedback(analog_pin, feedback_range=None): Use an analog pin as position feedback
         __str__(): Get the string representation of the servo
     """
 
     ROBOSERVO_MIN = 0
     ROBOSERVO_MAX = 1
 
-    def __init__(self, board: Arduino, pin: int) -> None:
+    MESSAGE_BYTES = 3
+
+    # Longer than the control and watchdog periods, so it only applies to a motion
+    # starting from rest and keeps it from jumping to the target at once
+    MAX_STEP_TIME = 0.05
+
+    def __init__(self, board: Arduino, pin: int, slew_rate: float = 300, max_speed: float = None) -> None:
         """
         Initialize the Servo class.
 
         Args:
             board (Arduino): The Arduino board.
             pin (int): The pin of the servo.
+            slew_rate (float): Speed of the servo, in degrees per second.
+            max_speed (float): Maximum speed of the commands, in degrees per second. Unlimited if None.
         """
         self._limits = [0, 180]  # Default values
+        self._board = board
         self._pin = board.get_pin("d:{}:s".format(pin))
         self.angle = 0
+        self.estimator = ServoEstimator(slew_rate)
+        self.max_speed = max_speed
+        self.target = None
+        self._step_time = None
 
     def get_limit(self, index: int) -> int:
         """
@@ -93,17 +122,53 @@ class Servo:
     def set_min(self, angle: int) -> None:
         self.set_limit(Servo.ROBOSERVO_MIN, angle)
 
+    @metrics.timed("servo_write_seconds")
     def write(self, angle: int) -> None:
         angle = max(
             self._limits[Servo.ROBOSERVO_MIN],
             min(angle, self._limits[Servo.ROBOSERVO_MAX]),
         )
+        self.target = angle
+        now = time.monotonic()
+        if self.max_speed is not None and self._step_time is not None:
+            max_step = self.max_speed * min(now - self._step_time, Servo.MAX_STEP_TIME)
+            angle = self.angle + max(-max_step, min(angle - self.angle, max_step))
         if angle != self.angle:
             self._pin.write(angle)
             self.angle = angle
+            self._step_time = now
+            self.estimator.command(angle)
+            metrics.inc("servo_writes_total")
+            metrics.inc("serial_bytes_total", Servo.MESSAGE_BYTES)
 
     def read(self) -> int:
         return self.angle
 
+    def position(self) -> float:
+        """Get the estimated actual angle of the servo, the last angle written if it was never commanded"""
+        position = self.estimator.position()
+        return position if position is not None else self.angle
+
+    def settled(self, tolerance: float = None) -> bool:
+        """Check whether the servo reached the last angle written"""
+        return self.estimator.settled(tolerance)
+
+    def attach_feedback(self, analog_pin: int, feedback_range: list = None) -> None:
+        """
+        Use an analog pin as position feedback. The board sampling must be enabled
+        with board.samplingOn()
+
+        Args:
+            analog_pin (int): The analog pin connected to the servo potentiometer
+            feedback_range (list): Analog readings ([0.0, 1.0]) at 0 and 180 degrees
+
+        Returns:
+            None
+        """
+        if feedback_range is not None:
+            self.estimator.feedback_range = feedback_range
+        self._board.analog[analog_pin].register_callback(self.estimator.on_feedback)
+        self._board.analog[analog_pin].enable_reporting()
+
     def __str__(self):
         return "{} {{ {} ; {} ; {} }}".format(self._pin.is_output(), *self._limits)
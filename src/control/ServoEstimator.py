@@ -0,0 +1,124 @@
+import time
+
+
+class ServoEstimator:
+    """
+    Class to estimate the actual position of a servo from its commands.
+
+    Without feedback, the servo is modeled as moving towards the last command at a
+    constant slew rate. When an analog feedback pin is attached, the last sample
+    reported by Firmata is used while it is recent.
+
+    Attributes:
+        slew_rate (float): Speed of the servo, in degrees per second
+        tolerance (float): Maximum distance, in degrees, to the target of a settled servo
+        feedback_timeout (float): Maximum age, in seconds, of a usable feedback sample
+        target (float): Last commanded angle
+
+    Methods:
+        command(angle, now=None): Register a new command
+        position(now=None): Get the estimated position
+        settled(tolerance=None, now=None): Check whether the servo reached its target
+        on_feedback(value): Firmata sampling callback of the analog feedback pin
+    """
+
+    def __init__(
+        self,
+        slew_rate: float = 300,
+        tolerance: float = 1.0,
+        feedback_range: list = None,
+        feedback_timeout: float = 0.1,
+    ) -> None:
+        """
+        Initialize the ServoEstimator class.
+
+        Args:
+            slew_rate (float): Speed of the servo, in degrees per second.
+            tolerance (float): Maximum distance, in degrees, to the target of a settled servo.
+            feedback_range (list): Analog readings ([0.0, 1.0]) of the feedback pin at 0 and 180 degrees.
+            feedback_timeout (float): Maximum age, in seconds, of a usable feedback sample.
+        """
+        self.slew_rate = slew_rate
+        self.tolerance = tolerance
+        self.feedback_range = feedback_range if feedback_range is not None else [0.0, 1.0]
+        self.feedback_timeout = feedback_timeout
+
+        self.target = None
+        self._start = None
+        self._start_time = 0.0
+        self._feedback = None
+        self._feedback_time = 0.0
+
+    def command(self, angle: float, now: float = None) -> None:
+        """
+        Register a new command
+
+        Args:
+            angle (float): Commanded angle
+            now (float): Time of the command in seconds. Defaults to time.monotonic()
+
+        Returns:
+            None
+        """
+        if now is None:
+            now = time.monotonic()
+        # The position before the first command is unknown, assume the servo is already there
+        self._start = self.position(now) if self.target is not None else angle
+        self._start_time = now
+        self.target = angle
+
+    def on_feedback(self, value: float) -> None:
+        """
+        Firmata sampling callback of the analog feedback pin
+
+        Args:
+            value (float): Analog reading ([0.0, 1.0])
+
+        Returns:
+            None
+        """
+        if value is None:
+            return
+        low, high = self.feedback_range
+        self._feedback = (value - low) / (high - low) * 180
+        self._feedback_time = time.monotonic()
+
+    def position(self, now: float = None) -> float:
+        """
+        Get the estimated position
+
+        Args:
+            now (float): Current time in seconds. Defaults to time.monotonic()
+
+        Returns:
+            float: Estimated angle, None before the first command
+        """
+        if now is None:
+            now = time.monotonic()
+        if self._feedback is not None and now - self._feedback_time < self.feedback_timeout:
+            return self._feedback
+        if self.target is None:
+            return None
+
+        travel = self.slew_rate * (now - self._start_time)
+        delta = self.target - self._start
+        if abs(delta) <= travel:
+            return self.target
+        return self._start + travel if delta > 0 else self._start - travel
+
+    def settled(self, tolerance: float = None, now: float = None) -> bool:
+        """
+        Check whether the servo reached its target
+
+        Args:
+            tolerance (float): Maximum distance to the target. Defaults to the tolerance attribute
+            now (float): Current time in seconds. Defaults to time.monotonic()
+
+        Returns:
+            bool: Whether the estimated position is within the tolerance of the target
+        """
+        if self.target is None:
+            return True
+        if tolerance is None:
+            tolerance = self.tolerance
+        return abs(self.position(now) - self.target) <= tolerance
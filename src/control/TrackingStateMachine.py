@@ -0,0 +1,102 @@
+import time
+
+
+class TrackingStateMachine:
+    """
+    State machine filtering the hand detections with time and confidence hysteresis.
+
+    States:
+        TRACKING: The hand is detected and the arm follows it
+        COASTING: The hand was lost for less than coast_time, the arm holds its position
+        HOMING: The hand was lost for longer, the arm moves smoothly to its home position
+        LOST: The arm is at its home position waiting for a hand
+
+    Attributes:
+        coast_time (float): Seconds without a detection before leaving COASTING
+        min_confidence (float): Confidence required to acquire the hand
+        keep_confidence (float): Confidence required to keep tracking the hand
+        reacquire_frames (int): Consecutive confident detections needed to acquire the hand
+        state (str): Current state
+
+    Methods:
+        update(detected, confidence, now=None): Update the state with a new detection
+        homed(): Notify that the arm reached its home position
+        reset(): Go back to the LOST state
+    """
+
+    TRACKING = "tracking"
+    COASTING = "coasting"
+    HOMING = "homing"
+    LOST = "lost"
+
+    def __init__(
+        self,
+        coast_time: float = 0.5,
+        min_confidence: float = 0.7,
+        keep_confidence: float = 0.5,
+        reacquire_frames: int = 3,
+    ) -> None:
+        """
+        Initialize the TrackingStateMachine class.
+
+        Args:
+            coast_time (float): Seconds without a detection before starting the homing.
+            min_confidence (float): Confidence ([0.0, 1.0]) required to acquire the hand.
+            keep_confidence (float): Confidence ([0.0, 1.0]) required to keep tracking the hand.
+            reacquire_frames (int): Consecutive confident detections needed to acquire the hand.
+        """
+        self.coast_time = coast_time
+        self.min_confidence = min_confidence
+        self.keep_confidence = min(keep_confidence, min_confidence)
+        self.reacquire_frames = reacquire_frames
+
+        self.state = self.LOST
+        self._last_seen = None
+        self._confident_frames = 0
+
+    def update(self, detected: bool, confidence: float = 1.0, now: float = None) -> str:
+        """
+        Update the state with a new detection
+
+        Args:
+            detected (bool): Whether a hand was detected in the frame
+            confidence (float): Confidence of the detection
+            now (float): Current time in seconds. Defaults to time.monotonic()
+
+        Returns:
+            str: The new state
+        """
+        if now is None:
+            now = time.monotonic()
+
+        if self.state in (self.TRACKING, self.COASTING):
+            if detected and confidence >= self.keep_confidence:
+                self.state = self.TRACKING
+                self._last_seen = now
+            elif now - self._last_seen < self.coast_time:
+                self.state = self.COASTING
+            else:
+                self.state = self.HOMING
+                self._confident_frames = 0
+        else:
+            if detected and confidence >= self.min_confidence:
+                self._confident_frames += 1
+            else:
+                self._confident_frames = 0
+
+            if self._confident_frames >= self.reacquire_frames:
+                self.state = self.TRACKING
+                self._last_seen = now
+
+        return self.state
+
+    def homed(self) -> None:
+        """Notify that the arm reached its home position"""
+        if self.state == self.HOMING:
+            self.state = self.LOST
+
+    def reset(self) -> None:
+        """Go back to the LOST state"""
+        self.state = self.LOST
+        self._last_seen = None
+        self._confident_frames = 0
@@ -0,0 +1,209 @@
+import os
+import time
+import threading
+import contextlib
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.sys.path.insert(0, root_dir)
+
+from src.control.RoboArm import RoboArm
+from src.utils.Metrics import metrics
+
+
+class Watchdog(threading.Thread):
+    """
+    Thread keeping the RoboArm inside its safety envelope, independently of the vision loop.
+
+    The control path only records the time of its last update with feed() and the
+    stages of the loop record their timing with stage(), both cheap enough to never
+    delay a command. Every period the watchdog continues the speed-limited motions and,
+    when no update arrived for max_command_age seconds, takes over the arm: it homes it
+    or stops it at its estimated position until the updates resume. Each stall is
+    reported with the duration of every stage, the stage still running being the one
+    that hung.
+
+    Attributes:
+        HOME (str): Stall action moving the arm back to its home position
+        STOP (str): Stall action stopping the arm where it is
+        arm (RoboArm): The watched arm
+        period (float): Seconds between two checks
+        max_command_age (float): Seconds without a control update before taking over the arm
+        action (str): HOME or STOP
+        homing_speed (float): Speed of the homing motion, in degrees per second
+        tripped (bool): Whether the watchdog currently controls the arm
+        stalls (list): Reports of the last stalls, see check()
+
+    Methods:
+        feed(now=None): Record a control update
+        stage(name): Context manager recording the timing of a stage of the loop
+        check(now=None): Run the checks once
+        stop(): Stop the thread
+    """
+
+    HOME = "home"
+    STOP = "stop"
+
+    def __init__(
+        self,
+        arm: RoboArm,
+        lock: threading.Lock = None,
+        period: float = 0.02,
+        max_command_age: float = 0.5,
+        action: str = HOME,
+        homing_speed: float = 60,
+        max_reports: int = 100,
+    ) -> None:
+        """
+        Initialize the Watchdog class.
+
+        Args:
+            arm (RoboArm): The watched arm.
+            lock (threading.Lock): Lock serializing the servo writes with the control path.
+            period (float): Seconds between two checks.
+            max_command_age (float): Seconds without a control update before taking over the arm.
+            action (str): HOME or STOP.
+            homing_speed (float): Speed of the homing motion, in degrees per second.
+            max_reports (int): Number of stall reports kept.
+        """
+        super().__init__(name="Watchdog", daemon=True)
+        self.arm = arm
+        self.lock = lock if lock is not None else threading.Lock()
+        self.period = period
+        self.max_command_age = max_command_age
+        self.action = action
+        self.homing_speed = homing_speed
+        self.max_reports = max_reports
+
+        self.tripped = False
+        self.stalls = []
+
+        self._last_feed = None
+        self._stages = {}  # Stage name: [start time, duration of the last run or None while running]
+        self._stopping = threading.Event()
+
+    def feed(self, now: float = None) -> None:
+        """Record a control update, the command of the arm is fresh"""
+        self._last_feed = time.monotonic() if now is None else now
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Context manager recording the start and duration of a stage of the loop
+
+        Args:
+            name (str): Name of the stage
+        """
+        timing = self._stages.get(name)
+        if timing is None:
+            timing = self._stages[name] = [0.0, None]
+        timing[0], timing[1] = time.monotonic(), None
+        try:
+            yield
+        finally:
+            timing[1] = time.monotonic() - timing[0]
+
+    def stage_times(self, now: float = None) -> dict:
+        """
+        Get the duration of the last run of every stage, or the time spent so far for a stage still running
+
+        Args:
+            now (float): Current time in seconds. Defaults to time.monotonic()
+
+        Returns:
+            dict: Dictionary of stage names and their duration in seconds
+        """
+        if now is None:
+            now = time.monotonic()
+        return {
+            name: duration if duration is not None else now - start
+            for name, (start, duration) in list(self._stages.items())
+        }
+
+    def check(self, now: float = None) -> None:
+        """
+        Continue the speed-limited motions and take over the arm if the command is too old
+
+        Args:
+            now (float): Current time in seconds. Defaults to time.monotonic()
+
+        Returns:
+            None
+        """
+        if now is None:
+            now = time.monotonic()
+        if self._last_feed is None:
+            return
+        age = now - self._last_feed
+
+        if age <= self.max_command_age:
+            if self.tripped:
+                self.tripped = False
+                metrics.inc("watchdog_recoveries_total")
+                print("Watchdog: control updates resumed")
+            if any(servo.target is not None and servo.target != servo.angle for servo in self.arm.servos.values()):
+                # A control update in progress writes the servos, the motion continues on the next check
+                if self.lock.acquire(blocking=False):
+                    try:
+                        self.arm.advance()
+                    finally:
+                        self.lock.release()
+                else:
+                    metrics.inc("watchdog_advance_skipped_total")
+            return
+
+        with self._arm_lock():
+            if not self.tripped:
+                self.tripped = True
+                self._report(now, age)
+                if self.action == self.STOP:
+                    self.arm.hold()
+            if self.action == self.HOME:
+                self.arm.home_step(max(1, self.homing_speed * self.period))
+            else:
+                self.arm.advance()
+
+    @contextlib.contextmanager
+    def _arm_lock(self):
+        # Only used on a stall: a control path hung while holding the lock does not write anymore,
+        # take over the arm anyway
+        locked = self.lock.acquire(timeout=self.period)
+        if not locked:
+            metrics.inc("watchdog_lock_timeouts_total")
+        try:
+            yield
+        finally:
+            if locked:
+                self.lock.release()
+
+    def _report(self, now: float, age: float) -> None:
+        stages = self.stage_times(now)
+        running = [name for name, (start, duration) in list(self._stages.items()) if duration is None]
+        report = {"time": now, "command_age": age, "stages": stages, "running": running}
+        self.stalls.append(report)
+        del self.stalls[:-self.max_reports]
+
+        metrics.inc("watchdog_trips_total")
+        for name, duration in stages.items():
+            metrics.set_gauge("watchdog_stall_stage_seconds_{}".format(name), duration)
+        print(
+            "Watchdog: no control update for {:.0f} ms, {} the arm. Running: {}. Stages: {}".format(
+                age * 1000,
+                "homing" if self.action == self.HOME else "stopping",
+                ", ".join(running) or "none",
+                ", ".join("{} {:.1f} ms".format(name, duration * 1000) for name, duration in stages.items()),
+            )
+        )
+
+    def run(self) -> None:
+        while not self._stopping.wait(self.period):
+            try:
+                self.check()
+            except Exception as e:
+                metrics.inc("watchdog_errors_total")
+                print("Watchdog: {}".format(e))
+
+    def stop(self) -> None:
+        """Stop the thread"""
+        self._stopping.set()
+        if self.is_alive():
+            self.join()
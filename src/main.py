@@ -3,13 +3,22 @@ import cv2
 import numpy as np
 import time
 import sys
+import threading
+import dataclasses
 from pyfirmata2 import Arduino
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 os.sys.path.insert(0, root_dir)
 
 from src.model.HandTracker import HandTracker
+from src.model.GestureEngine import GestureEngine
+from src.model.FeatureExtractor import FeatureExtractor
+from src.model.QualityController import QualityController, QualityLevel
 from src.control.RoboArm import RoboArm
+from src.control.TrackingStateMachine import TrackingStateMachine
+from src.control.Watchdog import Watchdog
+from src.utils.Metrics import metrics
+from src.utils.Config import Config, ConfigStore
 
 
 def draw_rect_fancy(image, pt1, pt2, color, thickness, r=20, d=20):
@@ -55,18 +64,59 @@ class HandFollowerController:
         tracker (HandTracker): HandTracker object
         board (Arduino): Arduino object
         controller (RoboArm): RoboArm object
+        config_store (ConfigStore): Store of the configuration, reloaded when the file changes
+        config (Config): Current configuration
         image_shape (tuple): Image resolution (width, height)
         cap (cv2.VideoCapture): VideoCapture object
         servos_values (dict): Dictionary of servo names and their angles
+        tracking (TrackingStateMachine): Hysteresis filter of the hand detections
+        homing_speed (float): Speed of the homing motion, in degrees per second
+        features (FeatureExtractor): Extractor of the hand features mapped to the servos, derived from the config
+        mapping_table (np.ndarray): Feature ranges and servo angles of each mapping with shape (servos, 4), derived from the config
+        gestures (GestureEngine): Gesture recognition over the recent landmarks
+        gesture_modes (dict): Dictionary of gesture names and the arm mode they toggle, from control.gesture_modes
+        mode (str): Current arm mode. The arm only follows the hand in the "follow" mode, which is restored when the hand is lost
+        quality (QualityController): Adaptive quality controller, None if disabled
+        inference_stride (int): Frames between two detections
+        control_sequence (int): result_sequence of the last detection result applied to the RoboArm
+        watchdog (Watchdog): Safety watchdog taking over the RoboArm when the control updates stall
 
     Methods:
         loop(): Main loop for tracking and controlling the RoboArm
+        start_control(): Start the control thread reacting to new detection results
+        stop_control(): Stop the control thread
+        process_frame(image: np.ndarray): Detect the hand in a frame, control the RoboArm and draw the information
         clear(): Clean up resources and close the webcam and detector
-        draw_info(image, rect_color=(255, 51, 51), text_color=(0, 128, 255)): Draw servo angle information on the image
-        follow_hand(landmark: int = 0): Control the RoboArm to follow the detected hand
+        apply_config(config: Config): Apply a new configuration and recompute the derived tables
+        apply_quality(level: QualityLevel): Apply a capture resolution, inference stride and number of hands
+        draw_info(image, rect_color=(255, 51, 51), text_color=(0, 128, 255)): Draw the servo angles and the arm mode on the image
+        follow_hand(hand_idx: int = 0): Control the RoboArm to follow the detected hand
+        update_servos_values(hand_idx: int = 0, result=None): Map the detected hand to the servo angles
     """
 
-    def __init__(self, port: str, model: str, image_shape: tuple = (480, 640)) -> None:
+    TRACKING_STATES = [
+        TrackingStateMachine.LOST,
+        TrackingStateMachine.TRACKING,
+        TrackingStateMachine.COASTING,
+        TrackingStateMachine.HOMING,
+    ]
+
+    def __init__(
+            self,
+            port: str,
+            model: str,
+            image_shape: tuple = (480, 640),
+            metrics_port: int = None,
+            metrics_file: str = None,
+            depth_calibration: str = None,
+            config_path: str = None,
+            profile: str = None,
+            latency_budget: float = None,
+            board: Arduino = None,
+            capture: cv2.VideoCapture = None,
+            tracker: HandTracker = None,
+            event_driven: bool = True,
+    ) -> None:
         """
         Initialize the HandFollowerController class.
 
@@ -74,20 +124,44 @@ class HandFollowerController:
             port (str): The port of the Arduino board.
             image_shape (tuple): The resolution of the webcam.
             model (str): The path to the model file.
+            metrics_port (int): Port of the local metrics endpoint. Disabled if None.
+            metrics_file (str): File where the metrics are dumped on exit. Disabled if None.
+            depth_calibration (str): Path of the depth calibration file, see calibrate_depth.py.
+            config_path (str): Path of the configuration file. The defaults are used if None.
+            profile (str): Name of the device profile in the configuration file.
+            latency_budget (float): End-to-end latency, in seconds, held by adapting the quality. Disabled if None.
+            board (Arduino): Board to use instead of connecting to the port, e.g. for offline runs.
+            capture (cv2.VideoCapture): Capture to use instead of the webcam.
+            tracker (HandTracker): Tracker to use instead of creating one from the model.
+            event_driven (bool): Whether the loop controls the RoboArm from a thread woken up by the new
+                detection results. Otherwise the RoboArm is controlled once per captured frame.
         """
+        # Start the metrics endpoint
+        self.metrics_file = metrics_file
+        metrics.track_rate("serial_bytes_total", "serial_bytes_per_second")
+        if metrics_port is not None:
+            metrics.serve(metrics_port)
+
+        # Load the configuration
+        self.config_store = ConfigStore(config_path, profile)
+        self.config = self.config_store.config
+
         # Initialize the HandTracker
-        self.tracker = HandTracker(
-            model=model,
-            num_hands=1,
-            min_hand_detection_confidence=0.5,
-            min_hand_presence_confidence=0.5,
-            min_tracking_confidence=0.5,
-        )
+        if tracker is None:
+            tracker = HandTracker(
+                model=model,
+                num_hands=self.config.tracker.num_hands,
+                min_hand_detection_confidence=self.config.tracker.min_hand_detection_confidence,
+                min_hand_presence_confidence=self.config.tracker.min_hand_presence_confidence,
+                min_tracking_confidence=self.config.tracker.min_tracking_confidence,
+                depth_calibration=depth_calibration,
+            )
+        self.tracker = tracker
 
         # Initialize the Arduino board and RoboArm
         try:
-            self.board = Arduino(port)
-            self.controller = RoboArm(self.board)
+            self.board = board if board is not None else Arduino(port)
+            self.controller = RoboArm(self.board, self.config.arm)
         except Exception as e:
             print(e)
             sys.exit(
@@ -101,14 +175,144 @@ class HandFollowerController:
             "claw": 0,
         }
 
+        # Hand-loss hysteresis, configured in apply_config
+        self.tracking = TrackingStateMachine()
+        self._last_follow = None
+        self._legacy_homed = True  # Whether the previous behaviour would have left the servos at home
+
+        # Gestures toggling the arm modes, configured in apply_config
+        self.gestures = GestureEngine()
+        self.gesture_modes = {}
+        self.mode = "follow"
+
         # Set webcam parameters
         self.image_shape = image_shape
-        self.cap = cv2.VideoCapture(0)
+        self.cap = capture if capture is not None else cv2.VideoCapture(0)
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.image_shape[1])
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.image_shape[0])
         self.cap.set(cv2.CAP_PROP_FPS, 30)
 
-        self.track_limits = [[40, self.image_shape[1] - 40], [50, self.image_shape[0] - 50]]
+        # Adaptive quality, starting from the requested resolution
+        self.quality = None
+        self.inference_stride = 1
+        self._frame_index = 0
+        self._frame = None  # Capture buffer reused across frames
+
+        # Control thread woken up by the detection results
+        self.event_driven = event_driven
+        self.control_sequence = self.tracker.result_sequence
+        self._control_lock = threading.Lock()  # Serializes the servo writes
+        self._control_thread = None
+        self._control_running = False
+
+        # Safety envelope, running in its own thread once the loop starts
+        self.watchdog = Watchdog(self.controller, self._control_lock)
+
+        if latency_budget is not None:
+            shapes = [level.image_shape for level in QualityController.DEFAULT_LEVELS]
+            start_level = shapes.index(tuple(image_shape)) if tuple(image_shape) in shapes else 1
+            self.quality = QualityController(latency_budget, start_level=start_level)
+
+        # Derived tables, recomputed only when the configuration changes
+        self.apply_config(self.config)
+        self.config_store.subscribe(self.apply_config)
+
+    def apply_config(self, config: Config) -> None:
+        """
+        Apply a new configuration and recompute the tables derived from it.
+
+        Args:
+            config (Config): The new configuration.
+        """
+        # The derived tables are built first and swapped in under the control lock,
+        # so the control thread never maps a hand with half of a configuration and
+        # a configuration failing here leaves the current one untouched
+        margin_x, margin_y = config.control.track_margins
+        track_limits = [
+            [margin_x, self.image_shape[1] - margin_x],
+            [margin_y, self.image_shape[0] - margin_y],
+        ]
+
+        # Feature range and servo angles of every mapping, evaluated together in update_servos_values
+        mapping = config.control.mapping
+        features = FeatureExtractor(
+            [servo.feature for servo in mapping.values()], self.tracker.depth_estimator
+        )
+        table = []
+        for name, servo in mapping.items():
+            angles = list(config.arm.servos[name.title()].limits)
+            table.append(
+                self._feature_range(servo.feature, servo.range, config, track_limits)
+                + (angles[::-1] if servo.invert else angles)
+            )
+        mapping_table = np.array(table, dtype=np.float64)
+        mapping_slopes = (mapping_table[:, 3] - mapping_table[:, 2]) / (mapping_table[:, 1] - mapping_table[:, 0])
+
+        if config.tracker != self.config.tracker:
+            self.tracker.reconfigure(**self._tracker_options(config))
+
+        with self._control_lock:
+            if config.arm != self.config.arm:
+                self.controller.apply_config(config.arm)
+            self.config = config
+            self.track_limits = track_limits
+            self.features = features
+            self.mapping_table = mapping_table
+            self._mapping_slopes = mapping_slopes
+
+            self.homing_speed = config.control.homing_speed
+            self.tracking.coast_time = config.control.coast_time
+            self.tracking.min_confidence = config.control.min_confidence
+            self.tracking.keep_confidence = config.control.keep_confidence
+            self.tracking.reacquire_frames = config.control.reacquire_frames
+            self.gesture_modes = dict(config.control.gesture_modes)
+            if self.mode not in self.gesture_modes.values():
+                self.mode = "follow"
+            self.watchdog.max_command_age = config.control.max_command_age
+            self.watchdog.action = config.control.stall_action
+            self.watchdog.homing_speed = config.control.homing_speed
+
+    @staticmethod
+    def _feature_range(feature: str, feature_range: list, config: Config, track_limits: list) -> list:
+        if feature_range is not None:
+            return list(feature_range)
+        if feature.endswith("_x"):
+            return list(track_limits[0])
+        if feature.endswith("_y"):
+            return list(track_limits[1])
+        if feature == "depth":
+            return list(config.control.depth_range)
+        if feature == "raised_fingers":
+            return list(config.control.finger_range)
+        return list(FeatureExtractor.DEFAULT_RANGES[feature])
+
+    def _tracker_options(self, config: Config) -> dict:
+        # The quality level caps the number of hands of the configuration
+        options = dataclasses.asdict(config.tracker)
+        if self.quality is not None:
+            options["num_hands"] = min(options["num_hands"], self.quality.current().num_hands)
+        return options
+
+    def apply_quality(self, level: QualityLevel) -> None:
+        """
+        Apply a capture resolution, inference stride and number of hands.
+
+        Args:
+            level (QualityLevel): The quality level.
+        """
+        if tuple(level.image_shape) != tuple(self.image_shape):
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, level.image_shape[1])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, level.image_shape[0])
+            self.image_shape = tuple(level.image_shape)
+            self.apply_config(self.config)
+
+        self.inference_stride = level.stride
+
+        options = self._tracker_options(self.config)
+        if options["num_hands"] != self.tracker.num_hands:
+            self.tracker.reconfigure(**options)
+
+        metrics.set_gauge("quality_level", self.quality.level)
 
     def loop(self) -> None:
         """
@@ -116,40 +320,129 @@ class HandFollowerController:
         """
         time.sleep(2)
 
+        if self.event_driven:
+            self.start_control()
+        self.watchdog.start()
+
         while self.cap.isOpened():
-            success, image = self.cap.read()
+            frame_start = time.perf_counter()
+            self.config_store.reload_if_changed()
+            with self.watchdog.stage("capture"):
+                success, self._frame = self.cap.read(self._frame)
 
             if not success:
                 sys.exit(
                     "ERROR: Unable to read from the webcam. Please verify your webcam settings."
                 )
 
-            cv2.flip(image, 1, image)
+            image = self.process_frame(self._frame)
 
-            try:
-                image = self.tracker.detect(image, draw=True)
-                self.follow_hand()
-                self.draw_info(image)
-                self.draw_limits_rectangle(image)
-            except Exception as e:
-                print(e)
+            with self.watchdog.stage("display"):
+                cv2.imshow("hand_landmarker", image)
+                key = cv2.waitKey(1)
 
-            cv2.imshow("hand_landmarker", image)
+            metrics.observe("frame_seconds", time.perf_counter() - frame_start)
 
-            if cv2.waitKey(1) & 0xFF == ord("q"):
+            if key & 0xFF == ord("q"):
                 break
 
         self.clear()
 
+    def process_frame(self, image: np.ndarray) -> np.ndarray:
+        """
+        Detect the hand in a captured frame, control the RoboArm and draw the information.
+
+        Args:
+            image (np.ndarray): The captured frame, modified in place.
+
+        Returns:
+            np.ndarray: The frame with the drawings.
+        """
+        capture_time = time.perf_counter()
+        cv2.flip(image, 1, image)
+
+        try:
+            self._frame_index += 1
+            with self.watchdog.stage("detect"):
+                if self._frame_index % self.inference_stride == 0:
+                    image = self.tracker.detect(image, draw=True)
+                else:
+                    image = self.tracker.draw_landmarks(image)
+            if self._control_thread is None:
+                with self.watchdog.stage("control"), self._control_lock:
+                    self.follow_hand()
+            with self.watchdog.stage("draw"):
+                self.draw_info(image)
+                self.draw_limits_rectangle(image)
+        except Exception as e:
+            metrics.inc("loop_errors_total")
+            print(e)
+
+        if self.quality is not None:
+            latency = time.perf_counter() - capture_time + self.tracker.LATENCY / 1000
+            level = self.quality.update(latency)
+            if level is not None:
+                self.apply_quality(level)
+
+        return image
+
+    def start_control(self) -> None:
+        """
+        Start the control thread. Every new detection result is mapped and written to the
+        servos as soon as it is received, and frames without a new result cost nothing.
+        """
+        if self._control_thread is not None:
+            return
+        self._control_running = True
+        self._control_thread = threading.Thread(target=self._control_loop, name="ArmControl", daemon=True)
+        self._control_thread.start()
+
+    def stop_control(self) -> None:
+        """
+        Stop the control thread.
+        """
+        if self._control_thread is None:
+            return
+        self._control_running = False
+        self._control_thread.join()
+        self._control_thread = None
+
+    def _control_loop(self) -> None:
+        while self._control_running:
+            # The timeout only bounds the time to notice stop_control()
+            sequence = self.tracker.wait_for_result(self.control_sequence, timeout=0.1)
+            if sequence == self.control_sequence:
+                continue
+
+            # Results received while the previous one was applied are superseded by the latest
+            metrics.inc("control_results_skipped_total", (sequence - self.control_sequence - 1) & 0xFFFFFFFF)
+            result_time = self.tracker.result_time
+            try:
+                with self.watchdog.stage("control"), self._control_lock:
+                    self.follow_hand()
+            except Exception as e:
+                metrics.inc("loop_errors_total")
+                print(e)
+            self.control_sequence = sequence
+
+            metrics.inc("control_updates_total")
+            metrics.observe("result_to_servo_seconds", time.perf_counter() - result_time)
+
     def clear(self) -> None:
         """
         Clean up resources and close the webcam and detector.
         """
+        self.stop_control()
+        self.watchdog.stop()
         self.tracker.detector.close()
         self.board.exit()
         self.cap.release()
         cv2.destroyAllWindows()
 
+        if self.metrics_file is not None:
+            metrics.dump(self.metrics_file)
+        metrics.close()
+
     def draw_info(
             self,
             image: np.ndarray,
@@ -157,7 +450,7 @@ class HandFollowerController:
             text_color: tuple = (0, 128, 255),
     ) -> None:
         """
-        Draw a rectangle and servo angle information on the image.
+        Draw a rectangle, the servo angles and the arm mode on the image.
 
         Args:
             image (np.ndarray): The image to draw on.
@@ -179,6 +472,17 @@ class HandFollowerController:
                 2,
             )
 
+        # The arm mode, the arm only moves with the hand in the follow mode
+        cv2.putText(
+            image,
+            "Mode: {}".format(self.mode.title()),
+            (text_x, text_y + len(self.controller.servos) * 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.8,
+            text_color if self.mode == "follow" else rect_color,
+            2,
+        )
+
     def draw_limits_rectangle(self, image):
         # Define origin point and rectangle size
         x1, y1 = self.track_limits[0][0], self.track_limits[1][0]
@@ -189,75 +493,120 @@ class HandFollowerController:
         # Draw rectangle in the track limits
         draw_rect_fancy(image, (x1, y1), (x2, y2), rect_color, 2, 20, 20)
 
-    def follow_hand(self, landmark: int = 0) -> None:
+    @metrics.timed("follow_hand_seconds")
+    def follow_hand(self, hand_idx: int = 0) -> None:
         """
         Control the RoboArm to follow the detected hand.
 
         Args:
-            landmark (int): The index of the landmark to track.
+            hand_idx (int): The index of the hand to follow.
 
         Returns:
             None
         """
-        landmark = self.tracker.get_hand_landmarks(idxs=[landmark])
-
-        if len(landmark) > 0:
-            x, y = landmark[0].x, landmark[0].y
-            z = self.tracker.get_approximate_depth()
-            n_finger = np.sum(self.tracker.raised_fingers())
-
-            self.servos_values["base"] = int(
-                np.interp(
-                    x * self.image_shape[1],
-                    self.track_limits[0],
-                    [
-                        self.controller.servos["Base"].get_limit(1),
-                        self.controller.servos["Base"].get_limit(0),
-                    ],
-                )
-            )
-            self.servos_values["height"] = int(
-                np.interp(
-                    y * self.image_shape[0],
-                    self.track_limits[1],
-                    [
-                        self.controller.servos["Height"].get_limit(1),
-                        self.controller.servos["Height"].get_limit(0),
-                    ],
-                )
-            )
-            self.servos_values["reach"] = int(
-                np.interp(
-                    z,
-                    [20, 80],
-                    [
-                        self.controller.servos["Reach"].get_limit(0),
-                        self.controller.servos["Reach"].get_limit(1),
-                    ],
+        # One snapshot of the result for the whole update, the detector callback may replace it meanwhile
+        result = self.tracker.DETECTION_RESULT
+        landmarks = self.tracker.get_landmarks_array(hand_idx, result=result)
+
+        now = time.monotonic()
+        dt = now - self._last_follow if self._last_follow is not None else 0
+        self._last_follow = now
+
+        state = self.tracking.update(landmarks is not None, self.tracker.get_hand_score(hand_idx, result), now)
+        metrics.set_gauge("tracking_state", self.TRACKING_STATES.index(state))
+        if state == TrackingStateMachine.LOST:
+            self.mode = "follow"
+
+        if state == TrackingStateMachine.TRACKING:
+            events = self.gestures.push(landmarks, now)
+        else:
+            events = self.gestures.push(None, now)
+        for event in events:
+            metrics.inc("gesture_events_total")
+            if event.name in self.gesture_modes:
+                target = self.gesture_modes[event.name]
+                self.mode = "follow" if self.mode == target else target
+
+        if state == TrackingStateMachine.TRACKING:
+            self._legacy_homed = False
+            if self.mode == "follow":
+                self.update_servos_values(hand_idx, result)
+                self.controller.control_servos(**self.servos_values)
+        else:
+            # Writes the previous behaviour would send by re-initializing the servos, only on the
+            # first frame of a loss since the servos were at home afterwards
+            legacy_writes = 0
+            if not self._legacy_homed:
+                legacy_writes = sum(
+                    servo.read() != self.controller.home_angle(name)
+                    for name, servo in self.controller.servos.items()
                 )
-            )
-            self.servos_values["claw"] = int(
-                np.interp(
-                    n_finger,
-                    [0, 5],
-                    [
-                        self.controller.servos["Claw"].get_limit(1),
-                        self.controller.servos["Claw"].get_limit(0),
-                    ],
+                self._legacy_homed = True
+            writes = 0
+            if state == TrackingStateMachine.HOMING:
+                angles = [servo.read() for servo in self.controller.servos.values()]
+                if self.controller.home_step(max(1, self.homing_speed * dt)) == 0:
+                    self.tracking.homed()
+                # home_step also counts the servos still moving, only the changed angles were written
+                writes = sum(
+                    servo.read() != angle for servo, angle in zip(self.controller.servos.values(), angles)
                 )
-            )
+            metrics.inc("homing_writes_saved_total", legacy_writes - writes)
 
-            self.controller.control_servos(**self.servos_values)
-        else:
-            self.controller.initialize_sensors()
+        self.watchdog.feed(now)
+
+    def update_servos_values(self, hand_idx: int = 0, result=None) -> None:
+        """
+        Map the features of the detected hand to the servo angles in servos_values,
+        as configured in control.mapping.
+
+        Args:
+            hand_idx (int): The index of the hand.
+            result (HandLandmarkerResult): The detection result. Defaults to the latest one.
+
+        Returns:
+            None
+        """
+        if result is None:
+            result = self.tracker.DETECTION_RESULT
+        values = self.features.extract(
+            self.tracker.get_landmarks_array(hand_idx, result=result),
+            self.tracker.get_landmarks_array(hand_idx, world=True, result=result),
+            self.tracker.get_handedness(hand_idx, result),
+            self.image_shape[1],
+            self.image_shape[0],
+        )
+
+        # Linear interpolation of every servo at once, clamped like np.interp
+        low, high, start, end = self.mapping_table.T
+        angles = np.where(
+            values <= low,
+            start,
+            np.where(values >= high, end, self._mapping_slopes * (values - low) + start),
+        )
+        for name, angle in zip(self.config.control.mapping, angles.tolist()):
+            self.servos_values[name] = int(angle)
 
 
 def main() -> None:
     image_shape = (480, 640)  # Change to match your webcam resolution
     port = Arduino.AUTODETECT
     model = os.path.join(root_dir, "res", "hand_landmarker.task")
-
-    controller = HandFollowerController(port, model=model)
+    metrics_port = None  # Set to a port (e.g. 9100) to expose the metrics endpoint
+    depth_calibration = os.path.join(root_dir, "res", "calibration", "depth.json")
+    config_path = os.path.join(root_dir, "res", "config.json")
+    profile = os.environ.get("ROBOARM_PROFILE")  # Device profile in the configuration file
+    latency_budget = None  # Set to a latency in seconds (e.g. 0.06) to adapt the quality under load
+
+    controller = HandFollowerController(
+        port,
+        model=model,
+        metrics_port=metrics_port,
+        depth_calibration=depth_calibration,
+        config_path=config_path,
+        profile=profile,
+        latency_budget=latency_budget,
+    )
     controller.loop()
 
 
@@ -0,0 +1,183 @@
+import os
+import json
+
+import numpy as np
+
+
+class DepthEstimator:
+    """
+    Class to estimate the distance of the hands to the camera from their apparent size.
+
+    The size of a hand is measured on several rigid palm segments. Each segment is divided
+    by its ratio to the 5-17 span so that all of them estimate the same quantity, and the
+    median of the estimates is used, which keeps the measure stable when one segment is
+    foreshortened. The depth is then a polynomial of the inverse of the size (pinhole model).
+    The calibration depends on the camera and the hand of the user and can be saved to disk.
+
+    Attributes:
+        PALM_PAIRS (list): Landmark index pairs of the palm segments
+        DEFAULT_RATIOS (list): Length of each segment relative to the 5-17 span
+        DEFAULT_SIZES (list): Reference 5-17 spans in pixels, at a 640x480 resolution
+        DEFAULT_DEPTHS (list): Reference depths in cm for DEFAULT_SIZES
+        coefficients (np.ndarray): Polynomial coefficients of the depth on the inverse of the size
+        ratios (np.ndarray): Length of each segment relative to the 5-17 span
+        width (int): Image width used during calibration
+        height (int): Image height used during calibration
+
+    Methods:
+        hand_sizes(landmarks, width, height): Calculate the size of each hand in calibration pixels
+        estimate(landmarks, width, height): Estimate the depth of each hand
+        fit(landmarks, depths, width, height, degree=2): Calibrate the estimator from samples
+        save(path): Save the calibration to a JSON file
+        load(path): Load a calibration from a JSON file
+    """
+
+    PALM_PAIRS = [(5, 17), (0, 5), (0, 9), (0, 17), (5, 9), (9, 13), (13, 17)]
+    DEFAULT_RATIOS = [1.0, 1.3, 1.3, 1.15, 0.35, 0.32, 0.35]
+
+    # x is the raw 5-17 distance, y is the value in cm
+    DEFAULT_SIZES = [300, 245, 200, 170, 145, 130, 112, 103, 93, 87, 80, 75, 70, 67, 62, 59, 57]
+    DEFAULT_DEPTHS = [20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85, 90, 95, 100]
+
+    def __init__(
+        self,
+        coefficients: list = None,
+        ratios: list = None,
+        width: int = 640,
+        height: int = 480,
+    ) -> None:
+        """
+        Initialize the DepthEstimator class.
+
+        Args:
+            coefficients (list): Polynomial coefficients of the depth on the inverse of the size. Defaults to a fit of the reference table.
+            ratios (list): Length of each palm segment relative to the 5-17 span. Defaults to DEFAULT_RATIOS.
+            width (int): Image width used during calibration.
+            height (int): Image height used during calibration.
+        """
+        self.width = width
+        self.height = height
+        self.ratios = np.array(ratios if ratios is not None else self.DEFAULT_RATIOS, dtype=np.float64)
+
+        if coefficients is None:
+            sizes = np.array(self.DEFAULT_SIZES) / 1.5
+            coefficients = np.polyfit(1 / sizes, self.DEFAULT_DEPTHS, 2)
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+
+        self._pairs = np.array(self.PALM_PAIRS)
+
+    def _segment_lengths(self, landmarks: np.ndarray, width: int, height: int) -> np.ndarray:
+        landmarks = np.asarray(landmarks, dtype=np.float64)
+        if landmarks.ndim == 2:
+            landmarks = landmarks[None]
+
+        # Pixels of the current image, rescaled to the calibration width
+        scale = np.array([width, height]) * (self.width / width)
+        points = landmarks[..., :2] * scale
+        return np.linalg.norm(points[:, self._pairs[:, 0]] - points[:, self._pairs[:, 1]], axis=2)
+
+    def hand_sizes(self, landmarks: np.ndarray, width: int = 640, height: int = 480) -> np.ndarray:
+        """
+        Calculate the size of each hand as the median of the 5-17 span estimates of its palm segments
+
+        Args:
+            landmarks (np.ndarray): Normalized landmarks with shape (hands, 21, 2 or 3) or (21, 2 or 3)
+            width (int): Width of the image
+            height (int): Height of the image
+
+        Returns:
+            np.ndarray: Size of each hand, in pixels of the calibration resolution
+        """
+        return np.median(self._segment_lengths(landmarks, width, height) / self.ratios, axis=1)
+
+    def estimate(self, landmarks: np.ndarray, width: int = 640, height: int = 480) -> np.ndarray:
+        """
+        Estimate the depth of each hand
+
+        Args:
+            landmarks (np.ndarray): Normalized landmarks with shape (hands, 21, 2 or 3) or (21, 2 or 3)
+            width (int): Width of the image
+            height (int): Height of the image
+
+        Returns:
+            np.ndarray: Depth of each hand in cm
+        """
+        sizes = np.maximum(self.hand_sizes(landmarks, width, height), 1e-6)
+        return np.polyval(self.coefficients, 1 / sizes)
+
+    def fit(
+        self,
+        landmarks: np.ndarray,
+        depths: np.ndarray,
+        width: int = 640,
+        height: int = 480,
+        degree: int = 2,
+    ) -> None:
+        """
+        Calibrate the estimator from samples of hands at known depths
+
+        Args:
+            landmarks (np.ndarray): Normalized landmarks of the samples with shape (samples, 21, 2 or 3)
+            depths (np.ndarray): Depth of each sample in cm
+            width (int): Width of the images of the samples
+            height (int): Height of the images of the samples
+            degree (int): Degree of the polynomial
+
+        Returns:
+            None
+        """
+        depths = np.asarray(depths, dtype=np.float64)
+        if len(np.unique(depths)) <= degree:
+            raise ValueError(
+                "At least {} different depths are needed to fit the model".format(degree + 1)
+            )
+
+        self.width, self.height = width, height
+        lengths = self._segment_lengths(landmarks, width, height)
+        self.ratios = np.median(lengths / lengths[:, :1], axis=0)
+        self.coefficients = np.polyfit(1 / self.hand_sizes(landmarks, width, height), depths, degree)
+
+    def save(self, path: str) -> None:
+        """
+        Save the calibration to a JSON file
+
+        Args:
+            path (str): Path of the file
+
+        Returns:
+            None
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "coefficients": self.coefficients.tolist(),
+                    "ratios": self.ratios.tolist(),
+                    "width": self.width,
+                    "height": self.height,
+                },
+                f,
+                indent=4,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "DepthEstimator":
+        """
+        Load a calibration from a JSON file
+
+        Args:
+            path (str): Path of the file
+
+        Returns:
+            DepthEstimator: The calibrated estimator
+        """
+        with open(path) as f:
+            calibration = json.load(f)
+        return cls(
+            coefficients=calibration["coefficients"],
+            ratios=calibration["ratios"],
+            width=calibration["width"],
+            height=calibration["height"],
+        )
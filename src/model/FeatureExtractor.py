@@ -0,0 +1,159 @@
+from collections import namedtuple
+
+import numpy as np
+
+Hand = namedtuple("Hand", ["landmarks", "world", "handedness", "width", "height"])
+
+PALM = [0, 1, 5, 9, 13, 17]
+FINGER_TIPS = np.array([8, 12, 16, 20])
+
+
+def wrist_x(hand: Hand) -> float:
+    """Horizontal position of the wrist, in pixels"""
+    return hand.landmarks[0, 0] * hand.width
+
+
+def wrist_y(hand: Hand) -> float:
+    """Vertical position of the wrist, in pixels"""
+    return hand.landmarks[0, 1] * hand.height
+
+
+def palm_x(hand: Hand) -> float:
+    """Horizontal position of the palm centroid, in pixels"""
+    return hand.landmarks[PALM, 0].mean() * hand.width
+
+
+def palm_y(hand: Hand) -> float:
+    """Vertical position of the palm centroid, in pixels"""
+    return hand.landmarks[PALM, 1].mean() * hand.height
+
+
+def raised_fingers(hand: Hand) -> float:
+    """Number of raised fingers, with the same rules as HandTracker.raised_fingers"""
+    world = hand.world
+    if hand.handedness == "Right":
+        thumb = world[4, 0] > world[3, 0]
+    else:
+        thumb = world[4, 0] < world[3, 0]
+    return float(thumb) + np.count_nonzero(world[FINGER_TIPS, 1] < world[FINGER_TIPS - 2, 1])
+
+
+def pinch(hand: Hand) -> float:
+    """Distance between the thumb and index tips, in cm"""
+    return np.linalg.norm(hand.world[4] - hand.world[8]) * 100
+
+
+def wrist_roll(hand: Hand) -> float:
+    """
+    Roll of the hand in (-180, 180] degrees, from the index knuckle to the pinky knuckle.
+    Zero with the fingers up for both hands, the left hand being mirrored
+    """
+    across = hand.world[17] - hand.world[5]
+    dx = -across[0] if hand.handedness == "Left" else across[0]
+    # arctan2 gives -180 for a negative zero, the roll is kept in (-180, 180]
+    return -((180 - np.degrees(np.arctan2(across[1], dx))) % 360 - 180)
+
+
+class FeatureExtractor:
+    """
+    Class to compute the features of a hand mapped to the servos.
+
+    A feature is a function of a Hand (normalized and world landmarks as arrays with
+    shape (21, 3), the handedness and the image size) returning a float. The features
+    are numpy expressions over the landmark arrays, so extracting them costs a few
+    microseconds each. New features are added with register().
+
+    Attributes:
+        FEATURES (dict): Dictionary of the registered feature names and their function
+        DEFAULT_RANGES (dict): Dictionary of feature names and the input range used when the mapping has none
+        features (list): Names of the extracted features
+
+    Methods:
+        register(name, function, default_range=None): Register a new feature
+        extract(landmarks, world, handedness, width, height): Compute the features of a hand
+    """
+
+    FEATURES = {
+        "wrist_x": wrist_x,
+        "wrist_y": wrist_y,
+        "palm_x": palm_x,
+        "palm_y": palm_y,
+        "depth": None,  # Bound to the DepthEstimator of the instance
+        "raised_fingers": raised_fingers,
+        "pinch": pinch,
+        "wrist_roll": wrist_roll,
+    }
+
+    DEFAULT_RANGES = {
+        "pinch": [2, 10],
+        "wrist_roll": [-60, 60],
+    }
+
+    @classmethod
+    def register(cls, name: str, function, default_range: list = None) -> None:
+        """
+        Register a new feature
+
+        Args:
+            name (str): Name of the feature, used in the control.mapping configuration
+            function (function): Function of a Hand returning a float
+            default_range (list): Input range used when the mapping has none
+
+        Returns:
+            None
+        """
+        cls.FEATURES[name] = function
+        if default_range is not None:
+            cls.DEFAULT_RANGES[name] = default_range
+
+    def __init__(self, features: list, depth_estimator=None) -> None:
+        """
+        Initialize the FeatureExtractor class.
+
+        Args:
+            features (list): Names of the features to extract, in order.
+            depth_estimator (DepthEstimator): Estimator of the "depth" feature.
+
+        Raises:
+            ValueError: If a feature is unknown or "depth" is requested without an estimator
+        """
+        self.features = list(features)
+        self._functions = []
+        for name in self.features:
+            if name not in self.FEATURES:
+                raise ValueError("unknown feature {}".format(name))
+            if name == "depth":
+                if depth_estimator is None:
+                    raise ValueError("the depth feature requires a DepthEstimator")
+                self._functions.append(
+                    lambda hand: depth_estimator.estimate(hand.landmarks, hand.width, hand.height)[0]
+                )
+            else:
+                self._functions.append(self.FEATURES[name])
+        self._values = np.empty(len(self.features))
+
+    def extract(
+        self,
+        landmarks: np.ndarray,
+        world: np.ndarray,
+        handedness: str,
+        width: int,
+        height: int,
+    ) -> np.ndarray:
+        """
+        Compute the features of a hand
+
+        Args:
+            landmarks (np.ndarray): Normalized landmarks with shape (21, 3)
+            world (np.ndarray): World landmarks, in meters, with shape (21, 3)
+            handedness (str): "Left" or "Right"
+            width (int): Width of the image
+            height (int): Height of the image
+
+        Returns:
+            np.ndarray: Value of each feature, in the order of features. Reused by the next call
+        """
+        hand = Hand(landmarks, world, handedness, width, height)
+        for index, function in enumerate(self._functions):
+            self._values[index] = function(hand)
+        return self._values
@@ -0,0 +1,176 @@
+from collections import namedtuple
+
+import numpy as np
+
+GestureEvent = namedtuple("GestureEvent", ["name", "timestamp"])
+
+
+class GestureEngine:
+    """
+    Class to recognize static and dynamic hand gestures over a rolling window of landmarks.
+
+    The landmarks of the last frames are kept in a fixed-size ring buffer and every
+    gesture is evaluated with vectorized operations over the window. An event is fired
+    when a gesture becomes active.
+
+    Gestures:
+        pinch: Thumb and index finger tips touching
+        grab: All finger tips close to the palm center
+        swipe_left, swipe_right: Fast horizontal motion of the wrist
+        hold: Hand kept still for hold_time seconds, used to lock the arm
+
+    Attributes:
+        GESTURES (tuple): Names of the recognized gestures
+        window (int): Number of frames kept in the ring buffer
+        debounce (int): Consecutive frames a static gesture must be seen to be active
+        pinch_ratio (float): Maximum tip distance, relative to the palm size, of a pinch
+        grab_ratio (float): Maximum mean tip distance to the palm center, relative to the palm size, of a grab
+        swipe_time (float): Time span, in seconds, of a swipe
+        swipe_distance (float): Minimum horizontal wrist displacement, in normalized units, of a swipe
+        hold_time (float): Time span, in seconds, of a hold
+        hold_tolerance (float): Maximum palm center displacement, in normalized units, during a hold
+        active (set): Gestures currently active
+
+    Methods:
+        push(landmarks, timestamp): Add the landmarks of a frame and return the fired events
+        evaluate(timestamp): Evaluate the gestures over the window
+        clear(): Empty the ring buffer
+    """
+
+    GESTURES = ("pinch", "grab", "swipe_left", "swipe_right", "hold")
+
+    WRIST = 0
+    THUMB_TIP = 4
+    INDEX_TIP = 8
+    MIDDLE_MCP = 9
+    TIP_IDS = [4, 8, 12, 16, 20]
+    PALM_IDS = [0, 5, 9, 13, 17]
+
+    def __init__(
+        self,
+        window: int = 64,
+        debounce: int = 3,
+        pinch_ratio: float = 0.35,
+        grab_ratio: float = 0.9,
+        swipe_time: float = 0.3,
+        swipe_distance: float = 0.25,
+        hold_time: float = 1.5,
+        hold_tolerance: float = 0.02,
+    ) -> None:
+        """
+        Initialize the GestureEngine class.
+
+        Args:
+            window (int): Number of frames kept in the ring buffer.
+            debounce (int): Consecutive frames a static gesture must be seen to be active.
+            pinch_ratio (float): Maximum tip distance, relative to the palm size, of a pinch.
+            grab_ratio (float): Maximum mean tip distance to the palm center, relative to the palm size, of a grab.
+            swipe_time (float): Time span, in seconds, of a swipe.
+            swipe_distance (float): Minimum horizontal wrist displacement, in normalized units, of a swipe.
+            hold_time (float): Time span, in seconds, of a hold. The window must cover it at the camera frame rate.
+            hold_tolerance (float): Maximum palm center displacement, in normalized units, during a hold.
+        """
+        self.window = window
+        self.debounce = min(debounce, window)
+        self.pinch_ratio = pinch_ratio
+        self.grab_ratio = grab_ratio
+        self.swipe_time = swipe_time
+        self.swipe_distance = swipe_distance
+        self.hold_time = hold_time
+        self.hold_tolerance = hold_tolerance
+
+        self._landmarks = np.zeros((window, 21, 3), dtype=np.float32)
+        self._times = np.full(window, -np.inf)
+        self._head = 0
+        self._size = 0
+
+        self.active = set()
+
+    def clear(self) -> None:
+        """Empty the ring buffer"""
+        self._times.fill(-np.inf)
+        self._head = 0
+        self._size = 0
+        self.active = set()
+
+    def push(self, landmarks: np.ndarray, timestamp: float) -> list:
+        """
+        Add the landmarks of a frame and return the fired events
+
+        Args:
+            landmarks (np.ndarray): Normalized landmarks of the hand with shape (21, 3), or None if no hand was detected
+            timestamp (float): Time of the frame in seconds
+
+        Returns:
+            list: List of GestureEvent for the gestures that became active in this frame
+        """
+        if landmarks is None:
+            self.clear()
+            return []
+
+        self._landmarks[self._head] = landmarks
+        self._times[self._head] = timestamp
+        self._head = (self._head + 1) % self.window
+        self._size = min(self._size + 1, self.window)
+
+        gestures = self.evaluate(timestamp)
+        events = [GestureEvent(name, timestamp) for name in sorted(gestures - self.active)]
+        self.active = gestures
+        return events
+
+    def evaluate(self, timestamp: float) -> set:
+        """
+        Evaluate the gestures over the window
+
+        Args:
+            timestamp (float): Time of the latest frame in seconds
+
+        Returns:
+            set: Names of the active gestures
+        """
+        gestures = set()
+        if self._size == 0:
+            return gestures
+
+        # Frames in chronological order, the latest last
+        order = (np.arange(self._head - self._size, self._head)) % self.window
+        landmarks = self._landmarks[order, :, :2]
+        times = self._times[order]
+
+        palm = landmarks[:, self.PALM_IDS].mean(axis=1)
+        palm_size = np.linalg.norm(landmarks[:, self.MIDDLE_MCP] - landmarks[:, self.WRIST], axis=1)
+        palm_size = np.maximum(palm_size, 1e-6)
+
+        # Static gestures over the last debounce frames
+        recent = slice(-self.debounce, None)
+        if self._size >= self.debounce:
+            pinch = np.linalg.norm(
+                landmarks[recent, self.THUMB_TIP] - landmarks[recent, self.INDEX_TIP], axis=1
+            )
+            if np.all(pinch / palm_size[recent] < self.pinch_ratio):
+                gestures.add("pinch")
+
+            grab = np.linalg.norm(
+                landmarks[recent][:, self.TIP_IDS] - palm[recent, None], axis=2
+            ).mean(axis=1)
+            if np.all(grab / palm_size[recent] < self.grab_ratio):
+                gestures.add("grab")
+
+        # Swipe: wrist displacement within the last swipe_time seconds
+        in_swipe = times >= timestamp - self.swipe_time
+        if np.count_nonzero(in_swipe) >= 2:
+            wrist_x = landmarks[in_swipe, self.WRIST, 0]
+            displacement = wrist_x[-1] - wrist_x[0]
+            if displacement >= self.swipe_distance:
+                gestures.add("swipe_right")
+            elif displacement <= -self.swipe_distance:
+                gestures.add("swipe_left")
+
+        # Hold: palm center still for hold_time seconds
+        in_hold = times >= timestamp - self.hold_time
+        if timestamp - times[in_hold][0] >= self.hold_time * 0.9:
+            spread = np.ptp(palm[in_hold], axis=0)
+            if np.all(spread < self.hold_tolerance):
+                gestures.add("hold")
+
+        return gestures
@@ -1,5 +1,8 @@
+import os
 import time
 import math
+import threading
+from collections import deque
 
 import cv2
 import numpy as np
@@ -9,6 +12,13 @@ from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 from mediapipe.framework.formats import landmark_pb2
 
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, root_dir)
+
+from src.utils.Metrics import metrics
+from src.model.DepthEstimator import DepthEstimator
+from src.model import LandmarkCodec
+
 class HandTracker:
     def __init__(
         self,
@@ -17,6 +27,7 @@ class HandTracker:
         min_hand_detection_confidence: float,
         min_hand_presence_confidence: float,
         min_tracking_confidence: float,
+        depth_calibration: str = None,
     ):
         """
         Initialize a HandTracker instance.
@@ -27,8 +38,10 @@ class HandTracker:
             min_hand_detection_confidence (float): Minimum confidence value ([0.0, 1.0]) for successful hand detection.
             min_hand_presence_confidence (float): Minimum confidence value ([0.0, 1.0]) for presence of a hand to be tracked.
             min_tracking_confidence (float): Minimum confidence value ([0.0, 1.0]) for successful hand landmark tracking.
+            depth_calibration (str, optional): Path of the depth calibration file. The default calibration is used if the file does not exist.
         """
         self.model = model
+        self.num_hands = num_hands
 
         self.detector = self.initialize_detector(
             num_hands,
@@ -43,19 +56,31 @@ class HandTracker:
 
         self.fps_avg_frame_count = 30
 
-        self.COUNTER, self.FPS = 0, 0
+        self.COUNTER, self.FPS = 0, 0  # COUNTER wraps around every fps_avg_frame_count results
+        self.LATENCY = 0  # ms between sending a frame and receiving its result
         self.START_TIME = time.time()
         self.DETECTION_RESULT = None
+        self._drawn_result = None
+        self._landmark_protos = []
+        self._landmark_arrays = {}
+        self._rgb_image = None  # Conversion buffer reused across frames, mp.Image copies it
+
+        # Timestamps of the frames sent to the detector still waiting for a result
+        self.pending_frames = deque(maxlen=256)
+
+        # Notification of new results to the threads waiting in wait_for_result
+        self.result_sequence = 0  # Wraps around at 2**32
+        self.result_time = None  # time.perf_counter() when the last result was received
+        self._result_condition = threading.Condition()
 
         self.tipIds = [4, 8, 12, 16, 20]
 
-        # x is the raw distance y is the value in cm
-        # x = [170, 132, 104, 92, 82, 72]
-        # y = [20, 25, 30, 35, 40, 45]
-        x = np.array([300, 245, 200, 170, 145, 130, 112, 103, 93, 87, 80, 75, 70, 67, 62, 59, 57]) / 1.5
-        y = [20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85, 90, 95, 100]
-        self.coff = np.polyfit(x, y, 2)  # y = Ax^2 + Bx + C
+        if depth_calibration is not None and os.path.exists(depth_calibration):
+            self.depth_estimator = DepthEstimator.load(depth_calibration)
+        else:
+            self.depth_estimator = DepthEstimator()
 
+    @metrics.timed("hand_tracker_save_result_seconds")
     def save_result(self, result: landmark_pb2.NormalizedLandmarkList, unused_output_image, timestamp_ms: int):
         """
         Saves the result of the detection.
@@ -72,12 +97,46 @@ class HandTracker:
             self.FPS = self.fps_avg_frame_count / (time.time() - self.START_TIME)
             self.START_TIME = time.time()
 
-        if len(result.handedness):
-            self.DETECTION_RESULT = result
-        else:
-            self.DETECTION_RESULT = None
+        with self._result_condition:
+            if len(result.handedness):
+                self.DETECTION_RESULT = result
+            else:
+                self.DETECTION_RESULT = None
+            self.result_sequence = (self.result_sequence + 1) & 0xFFFFFFFF
+            self.result_time = time.perf_counter()
+            self._result_condition.notify_all()
+
+        self.COUNTER = (self.COUNTER + 1) % self.fps_avg_frame_count
+
+        # Frames sent before this one without a result were dropped by the detector
+        dropped = 0
+        while self.pending_frames and self.pending_frames[0] <= timestamp_ms:
+            if self.pending_frames.popleft() != timestamp_ms:
+                dropped += 1
 
-        self.COUNTER += 1
+        self.LATENCY = time.time_ns() // 1_000_000 - timestamp_ms
+
+        metrics.inc("hand_tracker_results_total")
+        metrics.observe("hand_tracker_latency_seconds", self.LATENCY / 1000)
+        metrics.inc("hand_tracker_dropped_frames_total", dropped)
+        metrics.set_gauge("hand_tracker_queue_depth", len(self.pending_frames))
+        metrics.set_gauge("hand_tracker_fps", self.FPS)
+        metrics.set_gauge("hand_tracker_hands_detected", len(result.handedness))
+
+    def wait_for_result(self, sequence: int, timeout: float = None) -> int:
+        """
+        Waits for a detection result newer than the given one.
+
+        Args:
+            sequence (int): result_sequence of the last result handled by the caller.
+            timeout (float, optional): Maximum time to wait, in seconds. Defaults to None (no limit).
+
+        Returns:
+            int: result_sequence of the latest result, unchanged on timeout.
+        """
+        with self._result_condition:
+            self._result_condition.wait_for(lambda: self.result_sequence != sequence, timeout)
+            return self.result_sequence
 
     def initialize_detector(
         self,
@@ -110,6 +169,35 @@ class HandTracker:
         )
         return vision.HandLandmarker.create_from_options(options)
 
+    def reconfigure(
+        self,
+        num_hands: int,
+        min_hand_detection_confidence: float,
+        min_hand_presence_confidence: float,
+        min_tracking_confidence: float,
+    ) -> None:
+        """
+        Recreates the HandLandmarker instance with new parameters.
+
+        Args:
+            num_hands (int): Maximum number of hands to detect.
+            min_hand_detection_confidence (float): Minimum confidence value ([0.0, 1.0]) for successful hand detection.
+            min_hand_presence_confidence (float): Minimum confidence value ([0.0, 1.0]) for presence of a hand to be tracked.
+            min_tracking_confidence (float): Minimum confidence value ([0.0, 1.0]) for successful hand landmark tracking.
+
+        Returns:
+            None
+        """
+        self.detector.close()
+        self.pending_frames.clear()
+        self.num_hands = num_hands
+        self.detector = self.initialize_detector(
+            num_hands,
+            min_hand_detection_confidence,
+            min_hand_presence_confidence,
+            min_tracking_confidence,
+        )
+
     def draw_landmarks(
         self,
         image: np.ndarray,
@@ -146,26 +234,36 @@ class HandTracker:
 
         HANDEDNESS_TEXT_COLOR = (88, 205, 54)  # vibrant green
 
-        if self.DETECTION_RESULT:
+        result = self.DETECTION_RESULT
+        if result:
             # Landmark visualization parameters.
             MARGIN = 10  # pixels
             FONT_SIZE = 1
             FONT_THICKNESS = 1
+
+            # The protobuf landmarks are only rebuilt when a new result arrives
+            if self._drawn_result is not result:
+                self._drawn_result = result
+                self._landmark_protos = []
+                for hand_landmarks in result.hand_landmarks:
+                    hand_landmarks_proto = landmark_pb2.NormalizedLandmarkList()
+                    hand_landmarks_proto.landmark.extend(
+                        [
+                            landmark_pb2.NormalizedLandmark(
+                                x=landmark.x, y=landmark.y, z=landmark.z
+                            )
+                            for landmark in hand_landmarks
+                        ]
+                    )
+                    self._landmark_protos.append(hand_landmarks_proto)
+
             # Draw landmarks and indicate handedness.
-            for idx in range(len(self.DETECTION_RESULT.hand_landmarks)):
-                hand_landmarks = self.DETECTION_RESULT.hand_landmarks[idx]
-                handedness = self.DETECTION_RESULT.handedness[idx]
+            for idx in range(len(result.hand_landmarks)):
+                hand_landmarks = result.hand_landmarks[idx]
+                handedness = result.handedness[idx]
 
                 # Draw the hand landmarks.
-                hand_landmarks_proto = landmark_pb2.NormalizedLandmarkList()
-                hand_landmarks_proto.landmark.extend(
-                    [
-                        landmark_pb2.NormalizedLandmark(
-                            x=landmark.x, y=landmark.y, z=landmark.z
-                        )
-                        for landmark in hand_landmarks
-                    ]
-                )
+                hand_landmarks_proto = self._landmark_protos[idx]
                 self.mp_drawing.draw_landmarks(
                     image,
                     hand_landmarks_proto,
@@ -195,6 +293,7 @@ class HandTracker:
 
         return image
 
+    @metrics.timed("hand_tracker_detect_seconds")
     def detect(self, frame: np.ndarray, draw: bool = False) -> np.ndarray:
         """
         Detects hands in the image.
@@ -206,9 +305,12 @@ class HandTracker:
         Returns:
             numpy.ndarray: Image with the landmarks drawn if draw is True, else the original image.
         """
-        rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_image)
-        self.detector.detect_async(mp_image, time.time_ns() // 1_000_000)
+        self._rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_image)
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=self._rgb_image)
+        timestamp_ms = time.time_ns() // 1_000_000
+        self.pending_frames.append(timestamp_ms)
+        self.detector.detect_async(mp_image, timestamp_ms)
+        metrics.inc("hand_tracker_frames_total")
 
         return self.draw_landmarks(frame) if draw else frame
 
@@ -220,11 +322,12 @@ class HandTracker:
             list: List of 1s and 0s, where 1 indicates a raised finger and 0 indicates a lowered finger.
         """
         fingers = []
-        if self.DETECTION_RESULT:
+        result = self.DETECTION_RESULT
+        if result:
             for idx, hand_landmarks in enumerate(
-                self.DETECTION_RESULT.hand_world_landmarks
+                result.hand_world_landmarks
             ):
-                if self.DETECTION_RESULT.handedness[idx][0].category_name == "Right":
+                if result.handedness[idx][0].category_name == "Right":
                     if (
                         hand_landmarks[self.tipIds[0]].x
                         > hand_landmarks[self.tipIds[0] - 1].x
@@ -255,27 +358,126 @@ class HandTracker:
         self, hand_idx: int = 0, width: int = 640, height: int = 480
     ) -> float:
         """
-        Calculates the depth of each finger landmark.
+        Estimates the distance of a hand to the camera.
+
+        Args:
+            hand_idx (int, optional): Index of the hand. Defaults to 0.
+            width (int, optional): Width of the image. Defaults to 640.
+            height (int, optional): Height of the image. Defaults to 480.
 
         Returns:
-            numpy.ndarray: Mean of the depth of each finger landmark.
+            float: Depth of the hand in cm, None if the hand is not detected.
         """
-        if self.DETECTION_RESULT is not None:
-            x1, y1 = (
-                self.DETECTION_RESULT.hand_landmarks[hand_idx][5].x * width,
-                self.DETECTION_RESULT.hand_landmarks[hand_idx][5].y * height,
-            )
-            x2, y2 = (
-                self.DETECTION_RESULT.hand_landmarks[hand_idx][17].x * width,
-                self.DETECTION_RESULT.hand_landmarks[hand_idx][17].y * height,
+        landmarks = self.get_landmarks_array(hand_idx)
+        if landmarks is None:
+            return None
+        return float(self.depth_estimator.estimate(landmarks, width, height)[0])
+
+    def get_depths(self, width: int = 640, height: int = 480) -> np.ndarray:
+        """
+        Estimates the distance of every detected hand to the camera.
+
+        Args:
+            width (int, optional): Width of the image. Defaults to 640.
+            height (int, optional): Height of the image. Defaults to 480.
+
+        Returns:
+            numpy.ndarray: Depth of each hand in cm, empty if no hand is detected.
+        """
+        result = self.DETECTION_RESULT
+        if result is None:
+            return np.empty(0)
+        landmarks = np.array(
+            [[(landmark.x, landmark.y) for landmark in hand] for hand in result.hand_landmarks],
+            dtype=np.float32,
+        )
+        return self.depth_estimator.estimate(landmarks, width, height)
+
+    def get_hand_score(self, hand_idx: int = 0, result=None) -> float:
+        """
+        Returns the confidence score of the handedness classification.
+
+        Args:
+            hand_idx (int, optional): Index of the hand for which to return the score. Defaults to 0.
+            result (HandLandmarkerResult, optional): Result to read, see get_landmarks_array. Defaults to the latest one.
+
+        Returns:
+            float: Confidence score ([0.0, 1.0]), 0.0 if no hand is detected.
+        """
+        if result is None:
+            result = self.DETECTION_RESULT
+        if result is not None and hand_idx < len(result.handedness):
+            return result.handedness[hand_idx][0].score
+        return 0.0
+
+    def get_landmarks_array(self, hand_idx: int = 0, world: bool = False, result=None) -> np.ndarray:
+        """
+        Returns the hand landmarks as an array.
+
+        Args:
+            hand_idx (int, optional): Index of the hand for which to return the landmarks. Defaults to 0.
+            world (bool, optional): Whether to return the world landmarks instead of the normalized ones. Defaults to False.
+            result (HandLandmarkerResult, optional): Result to read. Defaults to the latest one. The callback may
+                replace the latest result at any time, pass the same DETECTION_RESULT to several calls to read
+                them from one result.
+
+        Returns:
+            numpy.ndarray: Array with shape (21, 3) with the x, y, z of each landmark, None if no hand is detected.
+                The array is shared by the callers until the next result and must not be modified.
+        """
+        if result is None:
+            result = self.DETECTION_RESULT
+        if result is None or hand_idx >= len(result.hand_landmarks):
+            return None
+
+        # The arrays are only rebuilt when a new result arrives
+        arrays = self._landmark_arrays
+        if arrays.get("result") is not result:
+            arrays = self._landmark_arrays = {"result": result}
+        key = (hand_idx, world)
+        if key not in arrays:
+            hand_landmarks = (result.hand_world_landmarks if world else result.hand_landmarks)[hand_idx]
+            arrays[key] = np.array(
+                [(landmark.x, landmark.y, landmark.z) for landmark in hand_landmarks],
+                dtype=np.float32,
             )
+        return arrays[key]
 
-            distance = math.sqrt((y2 - y1) ** 2 + (x2 - x1) ** 2)
-            A, B, C = self.coff
-        
-            return A * distance**2 + B * distance + C
-        else:
-            0
+    def get_handedness(self, hand_idx: int = 0, result=None) -> str:
+        """
+        Returns the handedness of a hand.
+
+        Args:
+            hand_idx (int, optional): Index of the hand. Defaults to 0.
+            result (HandLandmarkerResult, optional): Result to read, see get_landmarks_array. Defaults to the latest one.
+
+        Returns:
+            str: "Left" or "Right", None if no hand is detected.
+        """
+        if result is None:
+            result = self.DETECTION_RESULT
+        if result is not None and hand_idx < len(result.handedness):
+            return result.handedness[hand_idx][0].category_name
+        return None
+
+    def get_packed_landmarks(self, hand_idx: int = 0) -> bytes:
+        """
+        Returns the hand landmarks packed as a keyframe of the compact landmark format.
+
+        Args:
+            hand_idx (int, optional): Index of the hand for which to return the landmarks. Defaults to 0.
+
+        Returns:
+            bytes: The packed frame (see LandmarkCodec), None if no hand is detected.
+        """
+        result = self.DETECTION_RESULT
+        landmarks = self.get_landmarks_array(hand_idx, result=result)
+        if landmarks is None:
+            return None
+        handedness = LandmarkCodec.HANDEDNESS.get(
+            result.handedness[hand_idx][0].category_name, LandmarkCodec.UNKNOWN_HAND
+        )
+        return LandmarkCodec.pack_frame(landmarks, handedness, time.time_ns() // 1_000_000)
 
     def get_hand_world_landmarks(self, hand_idx: int = 0):
         """
@@ -308,12 +510,13 @@ class HandTracker:
         Returns:
             list: List of hand world landmarks.
         """
-        if self.DETECTION_RESULT is not None:
+        result = self.DETECTION_RESULT
+        if result is not None:
             if idxs is None:
-                return self.DETECTION_RESULT.hand_landmarks[hand_idx]
+                return result.hand_landmarks[hand_idx]
             else:
                 return [
-                    self.DETECTION_RESULT.hand_landmarks[hand_idx][idx] for idx in idxs
+                    result.hand_landmarks[hand_idx][idx] for idx in idxs
                 ]
             
         else:
@@ -0,0 +1,291 @@
+import struct
+
+import numpy as np
+
+# A packed hand frame starts with a flags byte:
+#   bits 0-1: encoding (KEYFRAME, DELTA8 or DELTA4)
+#   bits 2-3: handedness (LEFT, RIGHT or UNKNOWN_HAND)
+# followed by the timestamp and the 21 x 3 landmark coordinates quantized to int16:
+#   KEYFRAME: timestamp in ms (uint64, e.g. since the epoch) and the coordinates (int16)
+#   DELTA8:   ms since the previous frame (uint8) and the deltas (int8)
+#   DELTA4:   ms since the previous frame (uint8) and the deltas (4-bit, two per byte)
+KEYFRAME = 0
+DELTA8 = 1
+DELTA4 = 2
+
+LEFT = 0
+RIGHT = 1
+UNKNOWN_HAND = 2
+
+HANDEDNESS = {"Left": LEFT, "Right": RIGHT}
+
+NUM_LANDMARKS = 21
+NUM_VALUES = NUM_LANDMARKS * 3
+
+# Normalized coordinates in [-4, 4) with a resolution of 1/8192 (0.08 px at 640 px)
+SCALE = 8192
+
+KEYFRAME_STRUCT = struct.Struct("<BQ")
+DELTA_STRUCT = struct.Struct("<BB")
+
+KEYFRAME_SIZE = KEYFRAME_STRUCT.size + NUM_VALUES * 2
+DELTA8_SIZE = DELTA_STRUCT.size + NUM_VALUES
+DELTA4_SIZE = DELTA_STRUCT.size + (NUM_VALUES + 1) // 2
+
+
+def quantize(landmarks: np.ndarray) -> np.ndarray:
+    """
+    Quantize normalized landmarks to int16.
+
+    Args:
+        landmarks (np.ndarray): Landmarks with shape (..., 21, 3).
+
+    Returns:
+        np.ndarray: Quantized landmarks with the same shape.
+    """
+    scaled = np.rint(np.asarray(landmarks, dtype=np.float32) * SCALE)
+    return np.clip(scaled, -32768, 32767).astype(np.int16)
+
+
+def dequantize(quantized: np.ndarray) -> np.ndarray:
+    """
+    Convert quantized landmarks back to normalized float32 landmarks.
+
+    Args:
+        quantized (np.ndarray): Quantized landmarks with shape (..., 21, 3).
+
+    Returns:
+        np.ndarray: Landmarks with the same shape.
+    """
+    return quantized.astype(np.float32) / SCALE
+
+
+def pack_frame(landmarks: np.ndarray, handedness: int = UNKNOWN_HAND, timestamp_ms: int = 0) -> bytes:
+    """
+    Pack a hand frame as a keyframe.
+
+    Args:
+        landmarks (np.ndarray): Normalized landmarks with shape (21, 3).
+        handedness (int): LEFT, RIGHT or UNKNOWN_HAND.
+        timestamp_ms (int): Timestamp of the frame in ms.
+
+    Returns:
+        bytes: The packed frame (KEYFRAME_SIZE bytes).
+    """
+    return _pack_keyframe(quantize(landmarks), handedness, timestamp_ms)
+
+
+def unpack_frame(data: bytes) -> tuple:
+    """
+    Unpack a keyframe.
+
+    Args:
+        data (bytes): The packed frame.
+
+    Returns:
+        tuple: Landmarks with shape (21, 3), handedness and timestamp in ms.
+    """
+    return LandmarkDecoder().decode(data)
+
+
+def _pack_keyframe(quantized: np.ndarray, handedness: int, timestamp_ms: int) -> bytes:
+    header = KEYFRAME_STRUCT.pack(KEYFRAME | handedness << 2, timestamp_ms)
+    return header + quantized.astype("<i2").tobytes()
+
+
+def _pack_nibbles(deltas: np.ndarray) -> bytes:
+    values = np.append(deltas.ravel(), 0) if deltas.size % 2 else deltas.ravel()
+    values = values.astype(np.uint8) & 0x0F
+    return (values[0::2] | values[1::2] << 4).tobytes()
+
+
+def _unpack_nibbles(data: bytes) -> np.ndarray:
+    packed = np.frombuffer(data, dtype=np.uint8)
+    values = np.empty(packed.size * 2, dtype=np.int16)
+    values[0::2] = packed & 0x0F
+    values[1::2] = packed >> 4
+    # Sign extension of the 4-bit values
+    values[values > 7] -= 16
+    return values[:NUM_VALUES]
+
+
+class LandmarkEncoder:
+    """
+    Class to encode a stream of hand frames with delta encoding against the previous frame.
+
+    Deltas are computed between quantized frames, so the decoder reconstructs exactly the
+    quantized landmarks and errors never accumulate. A keyframe is sent when the deltas do
+    not fit in 8 bits, when the time step does not fit in a byte, and every keyframe_interval
+    frames so a decoder joining a stream or losing packets can resynchronize.
+
+    Attributes:
+        keyframe_interval (int): Maximum number of frames between two keyframes
+
+    Methods:
+        encode(landmarks, handedness, timestamp_ms): Encode a frame
+        reset(): Force the next frame to be a keyframe
+    """
+
+    def __init__(self, keyframe_interval: int = 30) -> None:
+        """
+        Initialize the LandmarkEncoder class.
+
+        Args:
+            keyframe_interval (int): Maximum number of frames between two keyframes.
+        """
+        self.keyframe_interval = keyframe_interval
+        self.reset()
+
+    def reset(self) -> None:
+        """Force the next frame to be a keyframe"""
+        self._reference = None
+        self._timestamp = 0
+        self._since_keyframe = 0
+
+    def encode(self, landmarks: np.ndarray, handedness: int = UNKNOWN_HAND, timestamp_ms: int = 0) -> bytes:
+        """
+        Encode a frame
+
+        Args:
+            landmarks (np.ndarray): Normalized landmarks with shape (21, 3)
+            handedness (int): LEFT, RIGHT or UNKNOWN_HAND
+            timestamp_ms (int): Timestamp of the frame in ms
+
+        Returns:
+            bytes: The packed frame
+        """
+        quantized = quantize(landmarks).ravel()
+        dt = timestamp_ms - self._timestamp
+
+        data = None
+        if self._reference is not None and 0 <= dt <= 255 and self._since_keyframe < self.keyframe_interval:
+            deltas = quantized.astype(np.int32) - self._reference
+            low, high = deltas.min(), deltas.max()
+            if low >= -8 and high <= 7:
+                data = DELTA_STRUCT.pack(DELTA4 | handedness << 2, dt) + _pack_nibbles(deltas)
+            elif low >= -128 and high <= 127:
+                data = DELTA_STRUCT.pack(DELTA8 | handedness << 2, dt) + deltas.astype(np.int8).tobytes()
+
+        if data is None:
+            data = _pack_keyframe(quantized, handedness, timestamp_ms)
+            self._since_keyframe = 0
+        else:
+            self._since_keyframe += 1
+
+        self._reference = quantized.astype(np.int32)
+        self._timestamp = timestamp_ms
+        return data
+
+
+class LandmarkDecoder:
+    """
+    Class to decode a stream of hand frames produced by a LandmarkEncoder.
+
+    Methods:
+        decode(data): Decode a frame
+        reset(): Drop the reference frame
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop the reference frame"""
+        self._reference = None
+        self._timestamp = 0
+
+    def decode(self, data: bytes) -> tuple:
+        """
+        Decode a frame
+
+        Args:
+            data (bytes): The packed frame
+
+        Returns:
+            tuple: Landmarks with shape (21, 3), handedness and timestamp in ms
+
+        Raises:
+            ValueError: If the frame is malformed or is a delta frame without a previous keyframe
+        """
+        if not data:
+            raise ValueError("Empty frame")
+        flags = data[0]
+        encoding, handedness = flags & 0x03, flags >> 2 & 0x03
+
+        if encoding == KEYFRAME:
+            if len(data) != KEYFRAME_SIZE:
+                raise ValueError("Invalid keyframe size {}".format(len(data)))
+            _, timestamp_ms = KEYFRAME_STRUCT.unpack_from(data)
+            quantized = np.frombuffer(data, dtype="<i2", offset=KEYFRAME_STRUCT.size).astype(np.int32)
+        elif encoding in (DELTA8, DELTA4):
+            if self._reference is None:
+                raise ValueError("Delta frame without a keyframe")
+            if len(data) != (DELTA8_SIZE if encoding == DELTA8 else DELTA4_SIZE):
+                raise ValueError("Invalid delta frame size {}".format(len(data)))
+            _, dt = DELTA_STRUCT.unpack_from(data)
+            timestamp_ms = self._timestamp + dt
+            payload = data[DELTA_STRUCT.size:]
+            if encoding == DELTA8:
+                deltas = np.frombuffer(payload, dtype=np.int8)
+            else:
+                deltas = _unpack_nibbles(payload)
+            quantized = self._reference + deltas
+        else:
+            raise ValueError("Unknown frame encoding {}".format(encoding))
+
+        self._reference = quantized
+        self._timestamp = timestamp_ms
+        return dequantize(quantized.reshape(NUM_LANDMARKS, 3)), handedness, timestamp_ms
+
+
+def encode_clip(landmarks: np.ndarray, handedness: np.ndarray, timestamps_ms: np.ndarray) -> bytes:
+    """
+    Encode a recorded clip of hand frames with vectorized delta encoding.
+
+    The clip is stored as the quantized first frame followed by the int16 deltas of the
+    following frames, which compress well with any general-purpose compressor.
+
+    Args:
+        landmarks (np.ndarray): Normalized landmarks with shape (frames, 21, 3)
+        handedness (np.ndarray): Handedness of each frame
+        timestamps_ms (np.ndarray): Timestamp of each frame in ms
+
+    Returns:
+        bytes: The packed clip
+    """
+    quantized = quantize(landmarks).reshape(len(landmarks), NUM_VALUES)
+    deltas = np.diff(quantized.astype(np.int32), axis=0, prepend=0).astype("<i2")
+    timestamps = np.asarray(timestamps_ms, dtype=np.int64)
+    dts = np.diff(timestamps, prepend=timestamps[:1]).astype("<u4")
+
+    header = struct.pack("<IQ", len(landmarks), int(timestamps[0]) if len(timestamps) else 0)
+    return (
+        header
+        + np.asarray(handedness, dtype=np.uint8).tobytes()
+        + dts.tobytes()
+        + deltas.tobytes()
+    )
+
+
+def decode_clip(data: bytes) -> tuple:
+    """
+    Decode a clip packed by encode_clip.
+
+    Args:
+        data (bytes): The packed clip
+
+    Returns:
+        tuple: Landmarks with shape (frames, 21, 3), handedness and timestamps in ms
+    """
+    frames, start = struct.unpack_from("<IQ", data)
+    offset = struct.calcsize("<IQ")
+    handedness = np.frombuffer(data, dtype=np.uint8, count=frames, offset=offset)
+    offset += frames
+    dts = np.frombuffer(data, dtype="<u4", count=frames, offset=offset)
+    offset += frames * 4
+    deltas = np.frombuffer(data, dtype="<i2", count=frames * NUM_VALUES, offset=offset)
+
+    # int16 arithmetic wraps around exactly like the encoder deltas
+    quantized = np.cumsum(deltas.reshape(frames, NUM_VALUES), axis=0, dtype=np.int16)
+    timestamps = start + np.cumsum(dts, dtype=np.int64)
+    return dequantize(quantized.reshape(frames, NUM_LANDMARKS, 3)), handedness.copy(), timestamps
@@ -0,0 +1,154 @@
+import os
+import time
+from collections import deque, namedtuple
+
+QualityLevel = namedtuple("QualityLevel", ["image_shape", "stride", "num_hands"])
+
+
+class QualityController:
+    """
+    Feedback controller trading capture resolution, inference stride and number of
+    hands to hold the end-to-end latency under a budget.
+
+    The levels are ordered from the most to the least expensive. The controller steps
+    down as soon as the smoothed latency or the CPU usage exceed their limits, and
+    steps up only after both stayed low for upgrade_delay seconds. When an upgrade is
+    reverted shortly after, the delay before the next one doubles, so the controller
+    does not oscillate between two levels.
+
+    Attributes:
+        DEFAULT_LEVELS (list): Default ladder of QualityLevel
+        levels (list): Ladder of QualityLevel, from the most to the least expensive
+        level (int): Index of the current level
+        latency_budget (float): Target end-to-end latency, in seconds
+        cpu_limit (float): CPU usage ([0.0, 1.0]) above which the quality is lowered
+        latency (float): Smoothed end-to-end latency, in seconds
+        cpu (float): Last measured CPU usage ([0.0, 1.0])
+        history (deque): (time, old level, new level, reason) of the last max_history changes
+
+    Methods:
+        update(latency, now=None): Add a latency measurement and get the new level if it changed
+        current(): Get the current QualityLevel
+        measure_cpu(): Measure the CPU usage
+    """
+
+    DEFAULT_LEVELS = [
+        QualityLevel((720, 1280), 1, 2),
+        QualityLevel((480, 640), 1, 1),
+        QualityLevel((480, 640), 2, 1),
+        QualityLevel((360, 480), 2, 1),
+        QualityLevel((240, 320), 3, 1),
+    ]
+
+    def __init__(
+        self,
+        latency_budget: float,
+        levels: list = None,
+        start_level: int = 1,
+        cpu_limit: float = 0.85,
+        smoothing: float = 0.1,
+        interval: float = 1.0,
+        upgrade_delay: float = 10.0,
+        max_history: int = 100,
+    ) -> None:
+        """
+        Initialize the QualityController class.
+
+        Args:
+            latency_budget (float): Target end-to-end latency, in seconds.
+            levels (list): Ladder of QualityLevel, from the most to the least expensive. Defaults to DEFAULT_LEVELS.
+            start_level (int): Index of the initial level.
+            cpu_limit (float): CPU usage ([0.0, 1.0]) above which the quality is lowered.
+            smoothing (float): Weight of a new measurement in the smoothed latency.
+            interval (float): Minimum time, in seconds, between two decisions.
+            upgrade_delay (float): Time, in seconds, the load must stay low before raising the quality.
+            max_history (int): Number of changes kept in history.
+        """
+        self.levels = levels if levels is not None else self.DEFAULT_LEVELS
+        self.level = max(0, min(start_level, len(self.levels) - 1))
+        self.latency_budget = latency_budget
+        self.cpu_limit = cpu_limit
+        self.smoothing = smoothing
+        self.interval = interval
+        self.upgrade_delay = upgrade_delay
+
+        self.latency = None
+        self.cpu = 0.0
+        self.history = deque(maxlen=max_history)
+
+        self._last_decision = None
+        self._low_since = None
+        self._last_upgrade = None
+        self._upgrade_delay = upgrade_delay
+        self._cpu_sample = (time.monotonic(), time.process_time())
+
+    def current(self) -> QualityLevel:
+        """Get the current QualityLevel"""
+        return self.levels[self.level]
+
+    def measure_cpu(self) -> float:
+        """
+        Measure the CPU usage as the largest of the load of the machine and the
+        usage of this process since the last call, relative to the number of CPUs
+
+        Returns:
+            float: CPU usage ([0.0, 1.0])
+        """
+        cpus = os.cpu_count() or 1
+        now, process = time.monotonic(), time.process_time()
+        last_now, last_process = self._cpu_sample
+        self._cpu_sample = (now, process)
+
+        usage = (process - last_process) / max(now - last_now, 1e-6) / cpus
+        if hasattr(os, "getloadavg"):
+            usage = max(usage, os.getloadavg()[0] / cpus)
+        return min(usage, 1.0)
+
+    def update(self, latency: float, now: float = None) -> QualityLevel:
+        """
+        Add a latency measurement and decide whether the quality changes
+
+        Args:
+            latency (float): End-to-end latency of the last frame, in seconds
+            now (float): Current time in seconds. Defaults to time.monotonic()
+
+        Returns:
+            QualityLevel: The new level if it changed, None otherwise
+        """
+        if now is None:
+            now = time.monotonic()
+        if self.latency is None:
+            self.latency = latency
+            self._last_decision = self._low_since = now
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+        if now - self._last_decision < self.interval:
+            return None
+        self._last_decision = now
+        self.cpu = self.measure_cpu()
+
+        if self.latency > self.latency_budget or self.cpu > self.cpu_limit:
+            self._low_since = now
+            if self.level < len(self.levels) - 1:
+                # Back off the upgrades that do not hold
+                if self._last_upgrade is not None and now - self._last_upgrade < self._upgrade_delay:
+                    self._upgrade_delay = min(self._upgrade_delay * 2, self.upgrade_delay * 8)
+                return self._change(self.level + 1, now, "latency {:.1f} ms, cpu {:.0%}")
+        elif self.latency > 0.7 * self.latency_budget or self.cpu > 0.7 * self.cpu_limit:
+            self._low_since = now
+        elif now - self._low_since >= self._upgrade_delay and self.level > 0:
+            if self._last_upgrade is not None and now - self._last_upgrade >= 2 * self._upgrade_delay:
+                self._upgrade_delay = self.upgrade_delay
+            self._low_since = self._last_upgrade = now
+            return self._change(self.level - 1, now, "latency {:.1f} ms, cpu {:.0%}")
+        return None
+
+    def _change(self, level: int, now: float, reason: str) -> QualityLevel:
+        reason = reason.format(self.latency * 1000, self.cpu)
+        self.history.append((now, self.level, level, reason))
+        print(
+            "Quality level {} -> {} ({}): {}".format(self.level, level, reason, self.levels[level])
+        )
+        self.level = level
+        return self.levels[level]
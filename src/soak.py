@@ -0,0 +1,303 @@
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from mediapipe.tasks.python.vision import HandLandmarkerResult
+from mediapipe.tasks.python.components.containers.category import Category
+from mediapipe.tasks.python.components.containers.landmark import Landmark, NormalizedLandmark
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, root_dir)
+
+from src.main import HandFollowerController
+from src.model.HandTracker import HandTracker
+from src.model import LandmarkCodec
+from src.control.TrackingStateMachine import TrackingStateMachine
+from src.utils.MemoryMonitor import MemoryMonitor
+
+
+def load_clip(path: str) -> tuple:
+    """
+    Load a recorded landmark clip.
+
+    Args:
+        path (str): Recording of calibrate_depth.py (.npz) or clip packed by LandmarkCodec.encode_clip.
+
+    Returns:
+        tuple: Landmarks with shape (frames, 21, 3) and the handedness name of each frame.
+    """
+    if path.endswith(".npz"):
+        landmarks = np.load(path)["landmarks"]
+        return landmarks, ["Right"] * len(landmarks)
+
+    with open(path, "rb") as f:
+        landmarks, handedness, _ = LandmarkCodec.decode_clip(f.read())
+    names = {value: name for name, value in LandmarkCodec.HANDEDNESS.items()}
+    return landmarks, [names.get(value, "Right") for value in handedness]
+
+
+class NullPin:
+    def write(self, value) -> None:
+        pass
+
+    def is_output(self) -> bool:
+        return True
+
+
+class NullBoard:
+    """Board discarding every command, the serial link is not part of the soak test"""
+
+    def get_pin(self, definition: str) -> NullPin:
+        return NullPin()
+
+    def samplingOn(self, sample_interval: int = 19) -> None:
+        pass
+
+    def exit(self) -> None:
+        pass
+
+
+class ClipDetector:
+    """
+    HandLandmarker replacement delivering the frames of a clip to the result callback.
+
+    A new result is built for every frame, like the detector does, followed by gap
+    frames without a hand after each pass over the clip.
+    """
+
+    def __init__(self, result_callback, landmarks: np.ndarray, handedness: list, gap: int = 30) -> None:
+        self.result_callback = result_callback
+        self.landmarks = landmarks
+        self.handedness = handedness
+        self.gap = gap
+        self.index = 0
+
+    def detect_async(self, image, timestamp_ms: int) -> None:
+        index = self.index % (len(self.landmarks) + self.gap)
+        self.index += 1
+
+        if index < len(self.landmarks):
+            hand = self.landmarks[index]
+            world = (hand - hand[0]) * 0.1
+            result = HandLandmarkerResult(
+                handedness=[[Category(index=0, score=0.95, category_name=self.handedness[index])]],
+                hand_landmarks=[[NormalizedLandmark(x=x, y=y, z=z) for x, y, z in hand.tolist()]],
+                hand_world_landmarks=[[Landmark(x=x, y=y, z=z) for x, y, z in world.tolist()]],
+            )
+        else:
+            result = HandLandmarkerResult(handedness=[], hand_landmarks=[], hand_world_landmarks=[])
+        self.result_callback(result, image, timestamp_ms)
+
+    def close(self) -> None:
+        pass
+
+
+class ClipTracker(HandTracker):
+    """HandTracker replaying a recorded clip instead of running the model"""
+
+    def __init__(self, landmarks: np.ndarray, handedness: list, gap: int = 30, **kwargs) -> None:
+        self.clip = (landmarks, handedness, gap)
+        super().__init__(model=None, **kwargs)
+
+    def initialize_detector(self, *args) -> ClipDetector:
+        return ClipDetector(self.save_result, *self.clip)
+
+
+class CountingStateMachine(TrackingStateMachine):
+    """TrackingStateMachine counting the updates spent in each state"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.counts = Counter()
+
+    def update(self, *args, **kwargs) -> str:
+        state = super().update(*args, **kwargs)
+        self.counts[state] += 1
+        return state
+
+
+class SimulatedClock:
+    """Replacement of time.monotonic following the simulated frame times instead of the wall clock"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def format_allocation(stat) -> str:
+    """Format a tracemalloc.StatisticDiff with the most recent frames of its traceback"""
+    lines = ["{:+.1f} KiB in {:+d} blocks".format(stat.size_diff / 1024, stat.count_diff)]
+    lines.extend("  " + line for line in stat.traceback.format(limit=3, most_recent_first=True))
+    return "\n".join(lines)
+
+
+def soak(
+    clip: str,
+    hours: float = 1.0,
+    fps: float = 30.0,
+    interval: float = 60.0,
+    warmup: float = 60.0,
+    max_growth: float = 1.0,
+    max_rss_growth: float = 32.0,
+    image_shape: tuple = (480, 640),
+    top: int = 10,
+    trace_frames: int = 4,
+) -> bool:
+    """
+    Run the pipeline on a recorded clip for a simulated duration and check that the memory stays bounded.
+
+    time.monotonic follows the simulated frame times during the run, so the gaps between the passes
+    over the clip last long enough for the arm to coast and home like it would live.
+
+    Args:
+        clip (str): Path of the recorded clip, see load_clip.
+        hours (float): Simulated duration, in hours. Frames are processed as fast as possible.
+        fps (float): Simulated frame rate.
+        interval (float): Simulated seconds between two memory samples.
+        warmup (float): Simulated seconds before taking the baseline.
+        max_growth (float): Maximum growth of the memory traced by tracemalloc, in MiB.
+        max_rss_growth (float): Maximum growth of the resident memory, in MiB.
+        image_shape (tuple): Resolution of the simulated frames.
+        top (int): Number of allocation sites reported.
+        trace_frames (int): Stack frames stored for each allocation. Tracing slows the frames down
+            proportionally, about 10 ms per frame with 4 frames.
+
+    Returns:
+        bool: Whether the memory stayed bounded and the tracking went through coasting and homing.
+    """
+    landmarks, handedness = load_clip(clip)
+    monitor = MemoryMonitor(trace_frames)
+
+    tracker = ClipTracker(
+        landmarks,
+        handedness,
+        num_hands=1,
+        min_hand_detection_confidence=0.5,
+        min_hand_presence_confidence=0.5,
+        min_tracking_confidence=0.5,
+    )
+    controller = HandFollowerController(
+        port=None,
+        model=None,
+        image_shape=image_shape,
+        board=NullBoard(),
+        capture=cv2.VideoCapture(),
+        tracker=tracker,
+    )
+
+    tracking = controller.tracking
+    controller.tracking = CountingStateMachine(
+        tracking.coast_time, tracking.min_confidence, tracking.keep_confidence, tracking.reacquire_frames
+    )
+
+    # The webcam writes every frame into the same buffer
+    source = np.full(tuple(image_shape) + (3,), 96, dtype=np.uint8)
+    frame = source.copy()
+
+    total_frames = int(hours * 3600 * fps)
+    warmup_frames = int(warmup * fps)
+    sample_frames = max(1, int(interval * fps))
+
+    clock = SimulatedClock()
+    monotonic, time.monotonic = time.monotonic, clock
+    controller.start_control()
+    monitor.start()
+    start = time.perf_counter()
+    try:
+        for index in range(1, total_frames + 1):
+            clock.now = index / fps
+            np.copyto(frame, source)
+            controller.process_frame(frame)
+
+            if index == warmup_frames:
+                sample = monitor.set_baseline(index / fps)
+            elif index > warmup_frames and (index - warmup_frames) % sample_frames == 0:
+                sample = monitor.sample(index / fps)
+            else:
+                continue
+            print("{:8.0f} s  rss {:8.1f} MiB  traced {:8.1f} KiB".format(
+                sample.time,
+                sample.rss / 2 ** 20 if sample.rss is not None else float("nan"),
+                sample.traced / 1024,
+            ))
+
+        if monitor.baseline is None:
+            sys.exit("ERROR: The simulated duration is shorter than the warm-up.")
+        if monitor.samples[-1].time < total_frames / fps:
+            monitor.sample(total_frames / fps)
+
+        rss_growth, growth = monitor.growth()
+        elapsed = time.perf_counter() - start
+        print("{} frames ({:.1f} h simulated) in {:.0f} s, {:.3f} ms per frame".format(
+            total_frames, total_frames / fps / 3600, elapsed, elapsed * 1000 / total_frames
+        ))
+        print("Traced memory growth: {:+.1f} KiB (limit {:.0f} KiB)".format(growth / 1024, max_growth * 1024))
+        if rss_growth is not None:
+            print("Resident memory growth: {:+.1f} MiB (limit {:.0f} MiB)".format(rss_growth / 2 ** 20, max_rss_growth))
+
+        print("Top allocation sites since the warm-up:")
+        for stat in monitor.top_allocations(top):
+            print(format_allocation(stat))
+    finally:
+        monitor.stop()
+        controller.clear()
+        time.monotonic = monotonic
+
+    counts = controller.tracking.counts
+    print("Updates per tracking state: {}".format(
+        ", ".join("{} {}".format(state, counts[state]) for state in HandFollowerController.TRACKING_STATES)
+    ))
+
+    bounded = growth <= max_growth * 2 ** 20
+    if rss_growth is not None:
+        bounded = bounded and rss_growth <= max_rss_growth * 2 ** 20
+    missing = [
+        state for state in (TrackingStateMachine.TRACKING, TrackingStateMachine.COASTING, TrackingStateMachine.HOMING)
+        if counts[state] == 0
+    ]
+    if missing:
+        print("The tracking never reached: {}".format(", ".join(missing)))
+    return bounded and not missing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Soak test: check that the memory stays bounded over hours of frames.")
+    parser.add_argument("clip", help="Recorded clip (.npz of calibrate_depth.py or LandmarkCodec clip)")
+    parser.add_argument("--hours", type=float, default=1.0, help="Simulated duration")
+    parser.add_argument("--fps", type=float, default=30.0, help="Simulated frame rate")
+    parser.add_argument("--interval", type=float, default=60.0, help="Simulated seconds between memory samples")
+    parser.add_argument("--warmup", type=float, default=60.0, help="Simulated seconds before the baseline")
+    parser.add_argument("--max-growth", type=float, default=1.0, help="Maximum traced memory growth, in MiB")
+    parser.add_argument("--max-rss-growth", type=float, default=32.0, help="Maximum resident memory growth, in MiB")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--top", type=int, default=10, help="Number of allocation sites reported")
+    parser.add_argument("--trace-frames", type=int, default=4, help="Stack frames stored for each allocation")
+    args = parser.parse_args()
+
+    bounded = soak(
+        args.clip,
+        hours=args.hours,
+        fps=args.fps,
+        interval=args.interval,
+        warmup=args.warmup,
+        max_growth=args.max_growth,
+        max_rss_growth=args.max_rss_growth,
+        image_shape=(args.height, args.width),
+        top=args.top,
+        trace_frames=args.trace_frames,
+    )
+    if not bounded:
+        sys.exit("ERROR: The memory grew beyond the limit or the clip did not exercise the homing.")
+    print("Memory bounded.")
+
+
+if __name__ == "__main__":
+    main()
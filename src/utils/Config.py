@@ -0,0 +1,461 @@
+import os
+import copy
+import json
+import time
+import dataclasses
+
+from dataclasses import dataclass, field
+
+from src.model.FeatureExtractor import FeatureExtractor
+from src.model.GestureEngine import GestureEngine
+
+MODES = ("follow", "locked")
+
+
+@dataclass
+class ServoConfig:
+    """
+    Configuration of a servo.
+
+    Attributes:
+        pin (int): Digital pin of the servo
+        limits (list): Minimum and maximum angles of the servo
+        home (int): Home angle of the servo. Defaults to the mean of the limits
+        slew_rate (float): Speed of the servo, in degrees per second
+        feedback_pin (int): Analog pin with the position feedback of the servo. Disabled if None
+        feedback_range (list): Analog readings ([0.0, 1.0]) of the feedback pin at 0 and 180 degrees
+        max_speed (float): Maximum speed of the commands, in degrees per second. Unlimited if None
+    """
+
+    pin: int
+    limits: list
+    home: int = None
+    slew_rate: float = 300
+    feedback_pin: int = None
+    feedback_range: list = None
+    max_speed: float = None
+
+    def home_angle(self) -> int:
+        return self.home if self.home is not None else sum(self.limits) // 2
+
+
+def _default_servos() -> dict:
+    return {
+        "Base": ServoConfig(pin=2, limits=[10, 140], home=60),
+        "Reach": ServoConfig(pin=3, limits=[60, 160]),
+        "Height": ServoConfig(pin=4, limits=[70, 170]),
+        "Claw": ServoConfig(pin=5, limits=[100, 170]),
+    }
+
+
+@dataclass
+class ArmConfig:
+    """
+    Configuration of the RoboArm.
+
+    Attributes:
+        servos (dict): Dictionary of servo names and their ServoConfig. The order is Base, Reach, Height, Claw
+        angle_correction_a (float): Slope of the Height/Reach coupling
+        angle_correction_b (float): Offset of the Height/Reach coupling
+    """
+
+    servos: dict = field(default_factory=_default_servos)
+    angle_correction_a: float = -0.75
+    angle_correction_b: float = 165
+
+
+@dataclass
+class TrackerConfig:
+    """
+    Configuration of the HandTracker.
+
+    Attributes:
+        num_hands (int): Maximum number of hands to detect
+        min_hand_detection_confidence (float): Minimum confidence value ([0.0, 1.0]) for hand detection
+        min_hand_presence_confidence (float): Minimum confidence value ([0.0, 1.0]) for hand presence
+        min_tracking_confidence (float): Minimum confidence value ([0.0, 1.0]) for hand tracking
+    """
+
+    num_hands: int = 1
+    min_hand_detection_confidence: float = 0.5
+    min_hand_presence_confidence: float = 0.5
+    min_tracking_confidence: float = 0.5
+
+
+@dataclass
+class ServoMapping:
+    """
+    Mapping of a hand feature to a servo.
+
+    Attributes:
+        feature (str): Name of the feature, see FeatureExtractor.FEATURES
+        range (list): Feature values mapped to the servo limits. Defaults to the range of the feature:
+            the tracking area for positions, depth_range, finger_range or FeatureExtractor.DEFAULT_RANGES
+        invert (bool): Whether the start of the range is mapped to the maximum angle
+    """
+
+    feature: str
+    range: list = None
+    invert: bool = False
+
+
+def _default_mapping() -> dict:
+    return {
+        "base": ServoMapping("wrist_x", invert=True),
+        "height": ServoMapping("wrist_y", invert=True),
+        "reach": ServoMapping("depth"),
+        "claw": ServoMapping("raised_fingers", invert=True),
+    }
+
+
+@dataclass
+class ControlConfig:
+    """
+    Configuration of the mapping from the hand to the servos.
+
+    Attributes:
+        track_margins (list): Horizontal and vertical margins, in pixels, of the tracking area
+        depth_range (list): Hand depths, in cm, mapped to the Reach limits
+        finger_range (list): Raised finger counts mapped to the Claw limits
+        homing_speed (float): Speed of the homing motion, in degrees per second
+        coast_time (float): Seconds without a detection before the arm starts homing
+        min_confidence (float): Confidence ([0.0, 1.0]) required to acquire the hand
+        keep_confidence (float): Confidence ([0.0, 1.0]) required to keep tracking the hand
+        reacquire_frames (int): Consecutive confident detections needed to acquire the hand
+        max_command_age (float): Seconds without a control update before the watchdog takes over the arm
+        stall_action (str): What the watchdog does with the arm on a stall, "home" or "stop"
+        gesture_modes (dict): Dictionary of gesture names and the arm mode they toggle, e.g. {"hold": "locked"}.
+            No gesture changes the mode if empty
+        mapping (dict): Dictionary of the servos (base, reach, height, claw) and their ServoMapping
+    """
+
+    track_margins: list = field(default_factory=lambda: [40, 50])
+    depth_range: list = field(default_factory=lambda: [20, 80])
+    finger_range: list = field(default_factory=lambda: [0, 5])
+    homing_speed: float = 60
+    coast_time: float = 0.5
+    min_confidence: float = 0.7
+    keep_confidence: float = 0.5
+    reacquire_frames: int = 3
+    max_command_age: float = 0.5
+    stall_action: str = "home"
+    gesture_modes: dict = field(default_factory=dict)
+    mapping: dict = field(default_factory=_default_mapping)
+
+
+@dataclass
+class Config:
+    """
+    Configuration of the hand follower.
+
+    Attributes:
+        arm (ArmConfig): Configuration of the RoboArm
+        tracker (TrackerConfig): Configuration of the HandTracker
+        control (ControlConfig): Configuration of the mapping from the hand to the servos
+
+    Methods:
+        from_dict(data): Build and validate a configuration from a dictionary
+        to_dict(): Convert the configuration to a dictionary
+        validate(): Check the values of the configuration
+    """
+
+    arm: ArmConfig = field(default_factory=ArmConfig)
+    tracker: TrackerConfig = field(default_factory=TrackerConfig)
+    control: ControlConfig = field(default_factory=ControlConfig)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Config":
+        """
+        Build and validate a configuration from a dictionary. Missing values keep their defaults.
+
+        Args:
+            data (dict): The configuration values
+
+        Returns:
+            Config: The configuration
+
+        Raises:
+            ValueError: If a key is unknown or a value is invalid
+        """
+        _check_object(data, "configuration")
+        for section in ("arm", "tracker", "control"):
+            _check_object(data.get(section, {}), section)
+        defaults = cls()
+        arm = _build(ArmConfig, data.get("arm", {}), "arm", exclude=("servos",))
+
+        servos = data.get("arm", {}).get("servos", {})
+        _check_object(servos, "arm.servos")
+        unknown = set(servos) - set(defaults.arm.servos)
+        if unknown:
+            raise ValueError("arm.servos: unknown servos {}".format(sorted(unknown)))
+        for name, values in servos.items():
+            _check_object(values, "arm.servos.{}".format(name))
+            default = dataclasses.asdict(defaults.arm.servos[name])
+            default.update(values)
+            arm.servos[name] = _build(ServoConfig, default, "arm.servos.{}".format(name))
+
+        control = _build(ControlConfig, data.get("control", {}), "control", exclude=("mapping",))
+        mapping = data.get("control", {}).get("mapping", {})
+        _check_object(mapping, "control.mapping")
+        unknown = set(mapping) - set(defaults.control.mapping)
+        if unknown:
+            raise ValueError("control.mapping: unknown servos {}".format(sorted(unknown)))
+        for name, values in mapping.items():
+            _check_object(values, "control.mapping.{}".format(name))
+            default = dataclasses.asdict(defaults.control.mapping[name])
+            if "feature" in values and values["feature"] != default["feature"]:
+                # The default range belongs to the default feature, the direction to its axis
+                same_axis = values["feature"][-2:] in ("_x", "_y") and values["feature"][-2:] == default["feature"][-2:]
+                default = {"feature": values["feature"], "invert": default["invert"] if same_axis else False}
+            default.update(values)
+            control.mapping[name] = _build(ServoMapping, default, "control.mapping.{}".format(name))
+
+        config = cls(
+            arm=arm,
+            tracker=_build(TrackerConfig, data.get("tracker", {}), "tracker"),
+            control=control,
+        )
+        unknown = set(data) - {f.name for f in dataclasses.fields(cls)}
+        if unknown:
+            raise ValueError("unknown sections {}".format(sorted(unknown)))
+        config.validate()
+        return config
+
+    def to_dict(self) -> dict:
+        """Convert the configuration to a dictionary"""
+        return dataclasses.asdict(self)
+
+    def validate(self) -> None:
+        """
+        Check the values of the configuration
+
+        Raises:
+            ValueError: If a value is invalid
+        """
+        pins = [servo.pin for servo in self.arm.servos.values()]
+        if len(set(pins)) != len(pins):
+            raise ValueError("arm.servos: pins must be unique, got {}".format(pins))
+
+        for name, servo in self.arm.servos.items():
+            if not isinstance(servo.pin, int) or servo.pin < 2:
+                raise ValueError("arm.servos.{}.pin: invalid digital pin {}".format(name, servo.pin))
+            _check_range(servo.limits, "arm.servos.{}.limits".format(name), 0, 180)
+            home = servo.home_angle()
+            if not servo.limits[0] <= home <= servo.limits[1]:
+                raise ValueError("arm.servos.{}.home: {} is outside the limits".format(name, home))
+            if servo.slew_rate <= 0:
+                raise ValueError("arm.servos.{}.slew_rate: must be positive".format(name))
+            if servo.max_speed is not None and servo.max_speed <= 0:
+                raise ValueError("arm.servos.{}.max_speed: must be positive".format(name))
+            if servo.feedback_range is not None and (
+                len(servo.feedback_range) != 2
+                or servo.feedback_range[0] == servo.feedback_range[1]
+                or not all(0.0 <= value <= 1.0 for value in servo.feedback_range)
+            ):
+                raise ValueError(
+                    "arm.servos.{}.feedback_range: expected two different readings in [0.0, 1.0]".format(name)
+                )
+
+        if self.arm.angle_correction_a == 0:
+            raise ValueError("arm.angle_correction_a: must not be zero")
+
+        if not isinstance(self.tracker.num_hands, int) or self.tracker.num_hands < 1:
+            raise ValueError("tracker.num_hands: must be a positive integer")
+        for name in (
+            "min_hand_detection_confidence",
+            "min_hand_presence_confidence",
+            "min_tracking_confidence",
+        ):
+            value = getattr(self.tracker, name)
+            if not 0.0 <= value <= 1.0:
+                raise ValueError("tracker.{}: {} is outside [0.0, 1.0]".format(name, value))
+
+        if len(self.control.track_margins) != 2 or min(self.control.track_margins) < 0:
+            raise ValueError("control.track_margins: expected two non-negative margins")
+        _check_range(self.control.depth_range, "control.depth_range")
+        _check_range(self.control.finger_range, "control.finger_range", 0, 5)
+        if self.control.homing_speed <= 0:
+            raise ValueError("control.homing_speed: must be positive")
+        if self.control.coast_time < 0:
+            raise ValueError("control.coast_time: must not be negative")
+        for name in ("min_confidence", "keep_confidence"):
+            value = getattr(self.control, name)
+            if not 0.0 <= value <= 1.0:
+                raise ValueError("control.{}: {} is outside [0.0, 1.0]".format(name, value))
+        if self.control.keep_confidence > self.control.min_confidence:
+            raise ValueError("control.keep_confidence: must not exceed min_confidence")
+        if not isinstance(self.control.reacquire_frames, int) or self.control.reacquire_frames < 1:
+            raise ValueError("control.reacquire_frames: must be a positive integer")
+        if self.control.max_command_age <= 0:
+            raise ValueError("control.max_command_age: must be positive")
+        if self.control.stall_action not in ("home", "stop"):
+            raise ValueError("control.stall_action: expected \"home\" or \"stop\", got {}".format(self.control.stall_action))
+        for gesture, mode in self.control.gesture_modes.items():
+            if gesture not in GestureEngine.GESTURES:
+                raise ValueError("control.gesture_modes: unknown gesture {}".format(gesture))
+            if mode not in MODES or mode == "follow":
+                raise ValueError("control.gesture_modes.{}: unknown mode {}".format(gesture, mode))
+        for name, mapping in self.control.mapping.items():
+            if mapping.feature not in FeatureExtractor.FEATURES:
+                raise ValueError("control.mapping.{}.feature: unknown feature {}".format(name, mapping.feature))
+            if mapping.range is not None:
+                _check_range(mapping.range, "control.mapping.{}.range".format(name))
+            elif not (
+                mapping.feature.endswith(("_x", "_y"))
+                or mapping.feature in ("depth", "raised_fingers")
+                or mapping.feature in FeatureExtractor.DEFAULT_RANGES
+            ):
+                raise ValueError(
+                    "control.mapping.{}.range: feature {} has no default range".format(name, mapping.feature)
+                )
+
+
+def _build(cls, values: dict, path: str, exclude: tuple = ()):
+    names = {f.name for f in dataclasses.fields(cls)}
+    unknown = set(values) - names
+    if unknown:
+        raise ValueError("{}: unknown keys {}".format(path, sorted(unknown)))
+    return cls(**{k: copy.deepcopy(v) for k, v in values.items() if k not in exclude})
+
+
+def _check_object(value, path: str) -> None:
+    if not isinstance(value, dict):
+        raise ValueError("{}: expected an object, got {}".format(path, type(value).__name__))
+
+
+def _check_range(values: list, path: str, low: float = None, high: float = None) -> None:
+    if len(values) != 2 or not values[0] < values[1]:
+        raise ValueError("{}: expected [min, max] with min < max, got {}".format(path, values))
+    if (low is not None and values[0] < low) or (high is not None and values[1] > high):
+        raise ValueError("{}: {} is outside [{}, {}]".format(path, values, low, high))
+
+
+def _merge(base: dict, override: dict) -> dict:
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+class ConfigStore:
+    """
+    Class to load the configuration from a JSON file and reload it when the file changes.
+
+    The file has a "default" section and a "profiles" section with the overrides of each
+    device. Invalid files are rejected and the previous configuration is kept.
+
+    Attributes:
+        path (str): Path of the configuration file
+        profile (str): Name of the device profile applied over the defaults
+        config (Config): The current configuration
+        version (int): Incremented every time a new configuration is loaded
+        check_interval (float): Minimum time, in seconds, between two checks of the file
+
+    Methods:
+        load(): Load the configuration from the file
+        reload_if_changed(): Reload the configuration if the file was modified
+        subscribe(callback): Call callback(config) every time a new configuration is loaded
+    """
+
+    def __init__(self, path: str = None, profile: str = None, check_interval: float = 1.0) -> None:
+        """
+        Initialize the ConfigStore class.
+
+        Args:
+            path (str): Path of the configuration file. The defaults are used if None or if the file does not exist.
+            profile (str): Name of the device profile applied over the defaults.
+            check_interval (float): Minimum time, in seconds, between two checks of the file.
+        """
+        self.path = path
+        self.profile = profile
+        self.check_interval = check_interval
+
+        self.config = Config()
+        self.version = 0
+        self._mtime = None
+        self._last_check = 0.0
+        self._callbacks = []
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def load(self) -> Config:
+        """
+        Load the configuration from the file
+
+        Returns:
+            Config: The new configuration
+
+        Raises:
+            ValueError: If the file or the profile are invalid
+            Exception: Raised by a subscriber rejecting the configuration, the previous one is kept
+        """
+        self._mtime = os.stat(self.path).st_mtime
+        with open(self.path) as f:
+            data = json.load(f)
+        _check_object(data, self.path)
+
+        values = data.get("default", {})
+        _check_object(values, "default")
+        if self.profile is not None:
+            profiles = data.get("profiles", {})
+            _check_object(profiles, "profiles")
+            if self.profile not in profiles:
+                raise ValueError("unknown profile {}".format(self.profile))
+            _check_object(profiles[self.profile], "profiles.{}".format(self.profile))
+            values = _merge(values, profiles[self.profile])
+
+        config = Config.from_dict(values)
+        previous, self.config = self.config, config
+        try:
+            for callback in self._callbacks:
+                callback(config)
+        except Exception:
+            self.config = previous
+            raise
+        self.version += 1
+        return config
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the configuration if the file was modified. Cheap enough to call every frame.
+
+        Returns:
+            bool: Whether a new configuration was loaded
+        """
+        now = time.monotonic()
+        if self.path is None or now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+
+        # A broken file must never stop the caller, whatever the failure
+        try:
+            self.load()
+        except Exception as e:
+            self._mtime = mtime
+            print("Invalid configuration {}, keeping the previous one: {}".format(self.path, e))
+            return False
+        return True
+
+    def subscribe(self, callback) -> None:
+        """
+        Call callback(config) every time a new configuration is loaded
+
+        Args:
+            callback (function): Function receiving the new Config. It may raise to reject the
+                configuration, and should then leave its state unchanged
+
+        Returns:
+            None
+        """
+        self._callbacks.append(callback)
@@ -0,0 +1,139 @@
+import os
+import fnmatch
+import tracemalloc
+from collections import namedtuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MemorySample = namedtuple("MemorySample", ["time", "rss", "traced"])
+
+
+def current_rss() -> int:
+    """
+    Get the resident set size of this process.
+
+    Returns:
+        int: Resident memory in bytes. The peak resident memory where the current one is not available, None if neither is.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        # ru_maxrss is in kB on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.sys.platform == "darwin" else peak * 1024
+    return None
+
+
+class MemoryMonitor:
+    """
+    Class to detect memory growth of a long-running loop with RSS samples and tracemalloc snapshots.
+
+    The baseline is taken once the loop warmed up (caches filled, buffers allocated),
+    so any growth measured afterwards is an allocation the loop keeps for every frame.
+
+    Attributes:
+        frames (int): Number of stack frames stored by tracemalloc for each allocation
+        samples (list): List of MemorySample, in bytes
+        baseline (MemorySample): Sample taken with the baseline snapshot, None before set_baseline()
+
+    Methods:
+        start(): Start tracing the allocations
+        stop(): Stop tracing the allocations
+        sample(now): Record the RSS and traced memory
+        set_baseline(now): Record a sample and a snapshot to compare with
+        growth(): Get the growth of the RSS and traced memory since the baseline
+        top_allocations(limit=10): Get the allocation sites that grew the most since the baseline
+    """
+
+    def __init__(self, frames: int = 5) -> None:
+        """
+        Initialize the MemoryMonitor class.
+
+        Args:
+            frames (int): Number of stack frames stored by tracemalloc for each allocation.
+        """
+        self.frames = frames
+        self.samples = []
+        self.baseline = None
+        self._snapshot = None
+
+    def start(self) -> None:
+        """Start tracing the allocations"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self) -> None:
+        """Stop tracing the allocations"""
+        tracemalloc.stop()
+
+    def sample(self, now: float) -> MemorySample:
+        """
+        Record the RSS and traced memory
+
+        Args:
+            now (float): Time of the sample, in seconds
+
+        Returns:
+            MemorySample: The sample
+        """
+        sample = MemorySample(now, current_rss(), tracemalloc.get_traced_memory()[0])
+        self.samples.append(sample)
+        return sample
+
+    def set_baseline(self, now: float) -> MemorySample:
+        """
+        Record a sample and a snapshot to compare with
+
+        Args:
+            now (float): Time of the sample, in seconds
+
+        Returns:
+            MemorySample: The sample
+        """
+        self._snapshot = self._take_snapshot()
+        self.baseline = self.sample(now)
+        return self.baseline
+
+    def growth(self) -> tuple:
+        """
+        Get the growth since the baseline, using the last sample
+
+        Returns:
+            tuple: Growth of the RSS (None if not available) and of the traced memory, in bytes
+        """
+        last = self.samples[-1]
+        rss = last.rss - self.baseline.rss if last.rss is not None and self.baseline.rss is not None else None
+        return rss, last.traced - self.baseline.traced
+
+    def top_allocations(self, limit: int = 10) -> list:
+        """
+        Get the allocation sites that grew the most since the baseline
+
+        Args:
+            limit (int): Number of allocation sites
+
+        Returns:
+            list: List of tracemalloc.StatisticDiff sorted by growth
+        """
+        stats = self._take_snapshot().compare_to(self._snapshot, "traceback")
+        stats = [stat for stat in stats if stat.size_diff > 0]
+        return sorted(stats, key=lambda stat: stat.size_diff, reverse=True)[:limit]
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            [
+                # Allocations of the snapshots themselves
+                tracemalloc.Filter(False, tracemalloc.__file__, all_frames=True),
+                tracemalloc.Filter(False, fnmatch.__file__, all_frames=True),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            ]
+        )
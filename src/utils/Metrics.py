@@ -0,0 +1,282 @@
+import time
+import bisect
+import threading
+import functools
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Metrics:
+    """
+    Lightweight registry of counters, gauges and latency histograms.
+
+    Every update is a dictionary operation guarded by a lock, so the cost per
+    call stays in the order of a microsecond, far below the frame time of the
+    hand tracking loop. The registry can be exported in the Prometheus text
+    format through a local HTTP endpoint or dumped to a file.
+
+    Attributes:
+        enabled (bool): Whether the updates are recorded
+        DEFAULT_BUCKETS (tuple): Upper bounds of the latency histograms, in seconds
+
+    Methods:
+        inc(name, value=1): Increment a counter
+        set_gauge(name, value): Set a gauge
+        observe(name, value): Add an observation to a histogram
+        timed(name): Decorator measuring the latency of a function
+        track_rate(counter, gauge): Export the rate per second of a counter as a gauge
+        get(name, default=0): Get the current value of a counter or gauge
+        render(): Render the metrics in the Prometheus text format
+        serve(port, host="127.0.0.1"): Serve the metrics from a local HTTP endpoint
+        dump(path): Write the metrics to a file
+        close(): Stop the HTTP endpoint
+        reset(): Remove all the recorded values
+    """
+
+    DEFAULT_BUCKETS = (
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+    )
+
+    def __init__(self, enabled: bool = True, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        """
+        Initialize the Metrics class.
+
+        Args:
+            enabled (bool): Whether the updates are recorded.
+            buckets (tuple): Upper bounds of the latency histograms, in seconds.
+        """
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._rates = {}
+        self._server = None
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """
+        Increment a counter
+
+        Args:
+            name (str): Name of the counter
+            value (float): Amount to add to the counter
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        Set a gauge
+
+        Args:
+            name (str): Name of the gauge
+            value (float): Current value of the gauge
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Add an observation to a histogram
+
+        Args:
+            name (str): Name of the histogram
+            value (float): Observed value, in seconds for latencies
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                # Bucket counts (+Inf last), sum and count
+                histogram = self._histograms[name] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][idx] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def timed(self, name: str):
+        """
+        Decorator measuring the latency of a function in a histogram
+
+        Args:
+            name (str): Name of the histogram
+
+        Returns:
+            function: The decorator
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def track_rate(self, counter: str, gauge: str) -> None:
+        """
+        Export the rate per second of a counter as a gauge. The rate is updated
+        every time the metrics are rendered.
+
+        Args:
+            counter (str): Name of the counter
+            gauge (str): Name of the gauge holding the rate
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._rates[counter] = [gauge, self._counters.get(counter, 0), time.monotonic()]
+
+    def get(self, name: str, default: float = 0) -> float:
+        """
+        Get the current value of a counter or gauge
+
+        Args:
+            name (str): Name of the counter or gauge
+            default (float): Value returned when the metric does not exist
+
+        Returns:
+            float: Value of the metric
+        """
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name]
+            return self._gauges.get(name, default)
+
+    def _update_rates(self) -> None:
+        now = time.monotonic()
+        for counter, rate in self._rates.items():
+            gauge, last_value, last_time = rate
+            value = self._counters.get(counter, 0)
+            if now > last_time:
+                self._gauges[gauge] = (value - last_value) / (now - last_time)
+            rate[1], rate[2] = value, now
+
+    def render(self) -> str:
+        """
+        Render the metrics in the Prometheus text format
+
+        Returns:
+            str: The metrics
+        """
+        lines = []
+        with self._lock:
+            self._update_rates()
+
+            for name, value in sorted(self._counters.items()):
+                lines.append("# TYPE {} counter".format(name))
+                lines.append("{} {}".format(name, value))
+
+            for name, value in sorted(self._gauges.items()):
+                lines.append("# TYPE {} gauge".format(name))
+                lines.append("{} {}".format(name, value))
+
+            for name, (counts, total, count) in sorted(self._histograms.items()):
+                lines.append("# TYPE {} histogram".format(name))
+                cumulative = 0
+                for bound, bucket in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket
+                    lines.append('{}_bucket{{le="{}"}} {}'.format(name, bound, cumulative))
+                lines.append("{}_sum {}".format(name, total))
+                lines.append("{}_count {}".format(name, count))
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve the metrics from a local HTTP endpoint in a background thread
+
+        Args:
+            port (int): Port of the endpoint
+            host (str): Address to bind. Defaults to the loopback interface
+
+        Returns:
+            ThreadingHTTPServer: The running server
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        return self._server
+
+    def dump(self, path: str) -> None:
+        """
+        Write the metrics to a file
+
+        Args:
+            path (str): Path of the file
+
+        Returns:
+            None
+        """
+        with open(path, "w") as f:
+            f.write(self.render())
+
+    def close(self) -> None:
+        """Stop the HTTP endpoint, if running"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset(self) -> None:
+        """Remove all the recorded values"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            for rate in self._rates.values():
+                rate[1], rate[2] = 0, time.monotonic()
+
+
+# Registry shared by the whole pipeline
+metrics = Metrics()
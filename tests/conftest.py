@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+
+import pytest
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from helpers import FakeBoard, FakeCapture, FakeClock, FakeDetector
+
+# Interactive scripts that need a board, a webcam or a user, run them by hand
+collect_ignore = ["robo_arm_test.py", "serial_test.py", "servo_test.py", "webcam_test.py"]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Deterministic time.monotonic, advanced by the tests"""
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def board():
+    return FakeBoard()
+
+
+@pytest.fixture
+def controller(monkeypatch, clock, board):
+    """HandFollowerController with a fake board, webcam and detector"""
+    from src import main
+    from src.model.HandTracker import HandTracker
+
+    monkeypatch.setattr(main, "Arduino", lambda port: board)
+    monkeypatch.setattr(main.cv2, "VideoCapture", FakeCapture)
+    monkeypatch.setattr(HandTracker, "initialize_detector", lambda self, *args: FakeDetector())
+
+    controller = main.HandFollowerController(port="fake", model="unused")
+    yield controller
+    controller.tracker.detector.close()
@@ -0,0 +1,201 @@
+import os
+import json
+from collections import namedtuple
+
+import numpy as np
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+Landmark = namedtuple("Landmark", ["x", "y", "z"])
+Category = namedtuple("Category", ["score", "category_name"])
+
+
+class FakePin:
+    """Servo pin of a FakeBoard recording every value written"""
+
+    def __init__(self, board, number: int) -> None:
+        self.board = board
+        self.number = number
+
+    def write(self, value) -> None:
+        self.board.writes.append((self.number, value))
+
+    def is_output(self) -> bool:
+        return True
+
+
+class FakeBoard:
+    """
+    Firmata board replacement recording the servo writes in order.
+
+    Attributes:
+        writes (list): List of (pin, value) in the order they were written
+    """
+
+    def __init__(self, port: str = None) -> None:
+        self.port = port
+        self.writes = []
+
+    def get_pin(self, definition: str) -> FakePin:
+        return FakePin(self, int(definition.split(":")[1]))
+
+    def samplingOn(self, sample_interval: int = 19) -> None:
+        pass
+
+    def exit(self) -> None:
+        pass
+
+
+class FakeCapture:
+    """cv2.VideoCapture replacement without a camera"""
+
+    def __init__(self, *args) -> None:
+        self.properties = {}
+
+    def set(self, prop, value) -> bool:
+        self.properties[prop] = value
+        return True
+
+    def get(self, prop):
+        return self.properties.get(prop, 0)
+
+    def isOpened(self) -> bool:
+        return False
+
+    def release(self) -> None:
+        pass
+
+
+class FakeDetector:
+    """HandLandmarker replacement, results are injected by the tests"""
+
+    def detect_async(self, image, timestamp_ms) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class FakeClock:
+    """Replacement of time.monotonic advanced manually"""
+
+    def __init__(self, start: float = 1000.0) -> None:
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakeResult:
+    """HandLandmarkerResult built from a recorded frame"""
+
+    def __init__(self, frame: dict) -> None:
+        if "landmarks" not in frame:
+            self.hand_landmarks, self.hand_world_landmarks, self.handedness = [], [], []
+            return
+        landmarks = np.asarray(frame["landmarks"], dtype=np.float64)
+        world = (landmarks - landmarks[0]) * 0.1
+        self.hand_landmarks = [[Landmark(*point) for point in landmarks]]
+        self.hand_world_landmarks = [[Landmark(*point) for point in world]]
+        self.handedness = [[Category(frame["score"], frame["handedness"])]]
+
+
+def load_frames(name: str = "landmarks.json") -> list:
+    """
+    Load a recorded landmark clip.
+
+    Args:
+        name (str): File name in the fixtures directory.
+
+    Returns:
+        list: Frames with the time step "dt" and, when a hand is detected, "landmarks", "handedness" and "score".
+    """
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)["frames"]
+
+
+# Normalized landmarks of an open right hand, palm facing the camera, with the wrist at (0.5, 0.8)
+OPEN_HAND = np.array(
+    [
+        (0.500, 0.800, 0.000),
+        (0.440, 0.750, -0.010), (0.400, 0.690, -0.015), (0.370, 0.640, -0.020), (0.350, 0.590, -0.025),
+        (0.450, 0.620, -0.010), (0.440, 0.540, -0.015), (0.435, 0.490, -0.020), (0.430, 0.450, -0.025),
+        (0.500, 0.610, -0.010), (0.500, 0.520, -0.015), (0.500, 0.470, -0.020), (0.500, 0.420, -0.025),
+        (0.550, 0.620, -0.010), (0.555, 0.540, -0.015), (0.560, 0.490, -0.020), (0.565, 0.450, -0.025),
+        (0.595, 0.650, -0.010), (0.605, 0.590, -0.015), (0.610, 0.550, -0.020), (0.615, 0.520, -0.025),
+    ]
+)
+
+
+def synthesize_hand(x: float, y: float, scale: float, raised: int) -> np.ndarray:
+    """
+    Build the landmarks of a hand with its wrist at (x, y).
+
+    Args:
+        x (float): Normalized x of the wrist.
+        y (float): Normalized y of the wrist.
+        scale (float): Size of the hand relative to OPEN_HAND.
+        raised (int): Number of raised fingers, from the thumb to the pinky.
+
+    Returns:
+        np.ndarray: Landmarks with shape (21, 3).
+    """
+    hand = OPEN_HAND.copy()
+    for finger in range(raised, 5):
+        base = 1 + 4 * finger
+        # Fold the finger: the tip and the previous joint go back to the knuckle
+        if finger == 0:
+            hand[base + 2:base + 4, 0] = hand[base + 1, 0] + 0.02
+        else:
+            hand[base + 2:base + 4, 1] = hand[base, 1] + 0.03
+    hand[:, :2] = (hand[:, :2] - OPEN_HAND[0, :2]) * scale + (x, y)
+    hand[:, 2] *= scale
+    return hand
+
+
+def synthesize_clip(fps: float = 30.0) -> list:
+    """
+    Build the landmark clip of the regression tests: the hand appears, moves around
+    the frame while changing its distance and raised fingers, drops out briefly,
+    comes back with a low-confidence flicker and leaves long enough for the arm to home.
+
+    Args:
+        fps (float): Frame rate of the clip.
+
+    Returns:
+        list: Frames as returned by load_frames.
+    """
+    frames = []
+
+    def add(landmarks=None, score=0.95):
+        frame = {"dt": round(1 / fps, 6)}
+        if landmarks is not None:
+            frame.update(landmarks=np.round(landmarks, 5).tolist(), handedness="Right", score=score)
+        frames.append(frame)
+
+    for _ in range(10):
+        add()
+    for i in range(60):
+        angle = 2 * np.pi * i / 60
+        add(synthesize_hand(
+            0.5 + 0.3 * np.cos(angle),
+            0.6 + 0.2 * np.sin(angle),
+            0.8 + 0.5 * np.sin(angle / 2),
+            (i // 12) % 6,
+        ))
+    for _ in range(5):
+        add()
+    for i in range(45):
+        score = 0.4 if i == 20 else 0.95
+        add(synthesize_hand(0.2 + 0.6 * i / 44, 0.7 - 0.3 * i / 44, 1.2 - 0.6 * i / 44, 5 - i // 9), score)
+    for _ in range(60):
+        add()
+    return frames
+
+
+if __name__ == "__main__":
+    with open(os.path.join(FIXTURES_DIR, "landmarks.json"), "w") as f:
+        json.dump({"fps": 30.0, "frames": synthesize_clip()}, f)
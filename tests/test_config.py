@@ -0,0 +1,132 @@
+import os
+import json
+
+import pytest
+
+from src.model.FeatureExtractor import FeatureExtractor
+from src.utils.Config import Config, ConfigStore, ServoMapping
+
+FILE = {
+    "default": {
+        "arm": {"servos": {"Claw": {"limits": [100, 170]}}},
+        "control": {"homing_speed": 60, "mapping": {"base": {"feature": "wrist_x", "invert": True}}},
+    },
+    "profiles": {
+        "bench": {
+            "arm": {"servos": {"Claw": {"limits": [110, 165]}}},
+            "control": {"homing_speed": 30},
+        }
+    },
+}
+
+
+def write(path, data):
+    # The modification time changes even within the resolution of the file system
+    mtime = os.stat(path).st_mtime if os.path.exists(path) else 0
+    with open(path, "w") as f:
+        f.write(data if isinstance(data, str) else json.dumps(data))
+    os.utime(path, (mtime + 1, mtime + 1))
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = os.path.join(tmp_path, "config.json")
+    write(path, FILE)
+    return path
+
+
+def test_profiles(path):
+    default = ConfigStore(path).config
+    assert default.arm.servos["Claw"].limits == [100, 170]
+    assert default.control.homing_speed == 60
+
+    # The profile is merged over the defaults, the values it does not set are kept
+    bench = ConfigStore(path, "bench").config
+    assert bench.arm.servos["Claw"].limits == [110, 165]
+    assert bench.arm.servos["Claw"].pin == 5
+    assert bench.control.homing_speed == 30
+    assert bench.control.mapping["base"].invert is True
+
+    with pytest.raises(ValueError):
+        ConfigStore(path, "unknown")
+
+
+def test_hot_reload(path):
+    store = ConfigStore(path, check_interval=0)
+    received = []
+    store.subscribe(received.append)
+    assert not store.reload_if_changed()
+
+    data = json.loads(json.dumps(FILE))
+    data["default"]["control"]["homing_speed"] = 90
+    write(path, data)
+    assert store.reload_if_changed()
+    assert store.config.control.homing_speed == 90
+    assert received == [store.config]
+    assert store.version == 2
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "{not json",
+        [1, 2],
+        {"default": []},
+        {"default": {"arm": []}},
+        {"default": {"arm": {"servos": {"Claw": 5}}}},
+        {"default": {"control": {"mapping": {"claw": "pinch"}}}},
+        {"default": {"control": {"homing_speed": -1}}},
+        {"default": {"tracker": {"hands": 2}}},
+    ],
+)
+def test_invalid_file_keeps_the_previous_config(path, data):
+    store = ConfigStore(path, check_interval=0)
+    config = store.config
+    write(path, data)
+    assert not store.reload_if_changed()
+    assert store.config is config
+    assert store.version == 1
+
+    # The file is not parsed again until it changes
+    assert not store.reload_if_changed()
+
+
+def test_rejected_by_a_subscriber(path):
+    store = ConfigStore(path, check_interval=0)
+    config = store.config
+
+    def reject(config):
+        raise KeyError("unsupported")
+
+    store.subscribe(reject)
+    write(path, FILE)
+    assert not store.reload_if_changed()
+    assert store.config is config
+
+
+def test_feature_without_default_range():
+    FeatureExtractor.register("thumb_z", lambda hand: hand.world[4, 2])
+    try:
+        with pytest.raises(ValueError):
+            Config.from_dict({"control": {"mapping": {"base": {"feature": "thumb_z"}}}})
+        config = Config.from_dict({"control": {"mapping": {"base": {"feature": "thumb_z", "range": [-0.05, 0.05]}}}})
+        assert config.control.mapping["base"].range == [-0.05, 0.05]
+    finally:
+        del FeatureExtractor.FEATURES["thumb_z"]
+
+
+def test_feature_change_keeps_axis_direction():
+    # Another feature on the same axis keeps the direction of the default one
+    mapping = Config.from_dict({"control": {"mapping": {"base": {"feature": "palm_x"}}}}).control.mapping
+    assert mapping["base"] == ServoMapping("palm_x", invert=True)
+
+    # Another axis or kind of feature starts from the feature defaults
+    mapping = Config.from_dict(
+        {"control": {"mapping": {"base": {"feature": "palm_y"}, "claw": {"feature": "pinch"}}}}
+    ).control.mapping
+    assert mapping["base"] == ServoMapping("palm_y")
+    assert mapping["claw"] == ServoMapping("pinch")
+
+    # An explicit direction wins
+    mapping = Config.from_dict({"control": {"mapping": {"base": {"feature": "palm_x", "invert": False}}}}).control.mapping
+    assert not mapping["base"].invert
@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+
+import numpy as np
+import pytest
+
+from helpers import synthesize_hand
+from src import calibrate_depth
+from src.model.DepthEstimator import DepthEstimator
+
+DEPTHS = [20, 30, 40, 50, 60, 70, 80]
+
+
+def hand_at(depth, x=0.5, y=0.7):
+    # Pinhole camera: the apparent size is inversely proportional to the depth
+    return synthesize_hand(x, y, 40 / depth, 5)
+
+
+def samples(rng, frames=10):
+    landmarks, depths = [], []
+    for depth in DEPTHS:
+        for _ in range(frames):
+            hand = hand_at(depth, *rng.uniform([0.4, 0.6], [0.6, 0.8]))
+            hand[:, :2] += rng.normal(0, 0.0005, (21, 2))
+            landmarks.append(hand)
+            depths.append(depth)
+    return np.array(landmarks), np.array(depths, dtype=np.float64)
+
+
+def test_fit_save_load(tmp_path):
+    landmarks, depths = samples(np.random.default_rng(0))
+    estimator = DepthEstimator()
+    estimator.fit(landmarks, depths, 640, 480)
+
+    path = os.path.join(tmp_path, "calibration", "depth.json")
+    estimator.save(path)
+    loaded = DepthEstimator.load(path)
+    np.testing.assert_allclose(loaded.coefficients, estimator.coefficients)
+    np.testing.assert_allclose(loaded.ratios, estimator.ratios)
+
+    for depth in (25, 45, 75):
+        assert loaded.estimate(hand_at(depth))[0] == pytest.approx(depth, abs=1.0)
+    # Estimates do not depend on the capture resolution
+    assert loaded.estimate(hand_at(45), 1280, 960)[0] == pytest.approx(45, abs=1.0)
+
+
+def test_fit_needs_enough_depths():
+    landmarks = np.array([hand_at(30), hand_at(30), hand_at(60)])
+    with pytest.raises(ValueError):
+        DepthEstimator().fit(landmarks, [30, 30, 60])
+
+
+def test_calibrate_from_clip(tmp_path, monkeypatch):
+    landmarks, depths = samples(np.random.default_rng(1), frames=3)
+    clip = os.path.join(tmp_path, "clip.npz")
+    np.savez_compressed(clip, landmarks=landmarks, depths=depths, width=640, height=480)
+    output = os.path.join(tmp_path, "depth.json")
+
+    monkeypatch.setattr(sys, "argv", ["calibrate_depth.py", "--clip", clip, "--output", output])
+    calibrate_depth.main()
+
+    with open(output) as f:
+        assert set(json.load(f)) == {"coefficients", "ratios", "width", "height"}
+    assert DepthEstimator.load(output).estimate(hand_at(50))[0] == pytest.approx(50, abs=1.0)
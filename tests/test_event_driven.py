@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import threading
+
+import numpy as np
+import pytest
+
+from helpers import FIXTURES_DIR, FakeResult, load_frames
+from src.utils.Config import Config
+from src.utils.Metrics import metrics
+
+
+def wait_for_control(controller, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while controller.control_sequence != controller.tracker.result_sequence:
+        if time.perf_counter() > deadline:
+            pytest.fail("the control thread did not handle the result")
+        time.sleep(0.0005)
+
+
+@pytest.fixture
+def control(controller):
+    controller.start_control()
+    yield controller
+    controller.stop_control()
+
+
+def test_results_drive_the_servos(control, clock, board):
+    with open(os.path.join(FIXTURES_DIR, "follow_hand_golden.json")) as f:
+        golden = json.load(f)["writes"]
+
+    writes = []
+    for index, frame in enumerate(load_frames()):
+        clock.advance(frame["dt"])
+        board.writes.clear()
+        control.tracker.pending_frames.append(index)
+        control.tracker.save_result(FakeResult(frame), None, index)
+        wait_for_control(control)
+        writes.append([list(write) for write in board.writes])
+
+    assert writes == golden
+
+
+def test_no_result_no_control(control, board):
+    board.writes.clear()
+    updates = metrics.get("control_updates_total")
+
+    # Frames sent to the detector without a result yet
+    for _ in range(10):
+        control.process_frame(np.zeros((48, 64, 3), dtype=np.uint8))
+
+    time.sleep(0.05)
+    assert metrics.get("control_updates_total") == updates
+    assert board.writes == []
+
+
+def test_result_replaced_during_update(controller, clock, board):
+    frame = next(frame for frame in load_frames() if "landmarks" in frame)
+    controller.tracking.state = controller.tracking.TRACKING
+    controller.tracking.update(True, 1.0, clock.now)
+    controller.tracker.DETECTION_RESULT = FakeResult(frame)
+
+    # The callback delivers a result without a hand in the middle of the update
+    get_hand_score = controller.tracker.get_hand_score
+
+    def replace_result(*args, **kwargs):
+        score = get_hand_score(*args, **kwargs)
+        controller.tracker.DETECTION_RESULT = None
+        return score
+
+    controller.tracker.get_hand_score = replace_result
+    board.writes.clear()
+    controller.follow_hand()
+    assert board.writes != []
+
+
+def test_config_swapped_under_the_control_lock(controller):
+    config = Config.from_dict({"control": {"track_margins": [80, 60], "mapping": {"base": {"feature": "palm_x"}}}})
+    table, slopes = controller.mapping_table, controller._mapping_slopes
+
+    # A control update in progress keeps the previous tables until it is done
+    with controller._control_lock:
+        thread = threading.Thread(target=controller.apply_config, args=(config,))
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+        assert controller.mapping_table is table and controller._mapping_slopes is slopes
+    thread.join()
+
+    assert controller.config is config
+    assert controller.features.features[0] == "palm_x"
+    assert controller.mapping_table[0, :2].tolist() == [80, 560]
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from helpers import FakeResult, synthesize_hand
+from src.model.FeatureExtractor import FeatureExtractor
+from src.utils.Config import Config
+
+
+def hand_frame(landmarks):
+    return {"landmarks": landmarks.tolist(), "handedness": "Right", "score": 0.95}
+
+
+def test_features():
+    landmarks = synthesize_hand(0.5, 0.8, 1.0, 5)
+    world = (landmarks - landmarks[0]) * 0.1
+    extractor = FeatureExtractor(["wrist_x", "palm_y", "raised_fingers", "pinch", "wrist_roll"])
+
+    values = extractor.extract(landmarks, world, "Right", 640, 480)
+    assert values[0] == pytest.approx(320)
+    assert values[1] == pytest.approx(np.mean(landmarks[[0, 1, 5, 9, 13, 17], 1]) * 480)
+    assert values[2] == 4  # The thumb of OPEN_HAND counts as lowered for a right hand
+    assert values[3] == pytest.approx(np.linalg.norm(world[4] - world[8]) * 100)
+    assert -180 < values[4] <= 180
+
+
+def test_wrist_roll_both_hands():
+    extractor = FeatureExtractor(["wrist_roll"])
+    right = synthesize_hand(0.5, 0.6, 1.0, 5)
+    left = right.copy()
+    left[:, 0] = 1 - left[:, 0]
+
+    # Fingers up: the knuckle line is close to horizontal for both hands
+    right_roll = extractor.extract(right, (right - right[0]) * 0.1, "Right", 640, 480)[0]
+    left_roll = extractor.extract(left, (left - left[0]) * 0.1, "Left", 640, 480)[0]
+    assert abs(right_roll) < 15
+    assert left_roll == pytest.approx(right_roll)
+
+    # Tilting the hand by 30 degrees in the image plane moves the roll by 30 degrees, both hands alike
+    angle = np.radians(30)
+    rotation = np.array([[np.cos(angle), -np.sin(angle), 0], [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+    tilted = (right - right[0]) @ rotation.T
+    mirrored = tilted * [-1, 1, 1]
+    assert extractor.extract(right, tilted * 0.1, "Right", 640, 480)[0] == pytest.approx(right_roll + 30)
+    assert extractor.extract(left, mirrored * 0.1, "Left", 640, 480)[0] == pytest.approx(right_roll + 30)
+
+    # The roll is continuous through a quarter turn, 89 and 91 degrees read close to each other
+    rolls = []
+    for target in (89, 91):
+        angle = np.radians(target - right_roll)
+        rotation = np.array([[np.cos(angle), -np.sin(angle), 0], [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+        rolls.append(extractor.extract(right, (right - right[0]) @ rotation.T * 0.1, "Right", 640, 480)[0])
+    assert rolls == pytest.approx([89, 91])
+
+    # Upside down hands read close to 180 degrees
+    flipped = -(right - right[0])
+    assert abs(extractor.extract(right, flipped * 0.1, "Right", 640, 480)[0]) == pytest.approx(180 - abs(right_roll))
+
+
+def test_raised_fingers_matches_tracker(controller):
+    extractor = FeatureExtractor(["raised_fingers"])
+    for raised in range(6):
+        controller.tracker.DETECTION_RESULT = FakeResult(hand_frame(synthesize_hand(0.5, 0.6, 1.0, raised)))
+        value = extractor.extract(
+            controller.tracker.get_landmarks_array(),
+            controller.tracker.get_landmarks_array(world=True),
+            controller.tracker.get_handedness(),
+            640,
+            480,
+        )[0]
+        assert value == sum(controller.tracker.raised_fingers())
+
+
+def test_proportional_claw(controller):
+    controller.apply_config(
+        Config.from_dict({"control": {"mapping": {"claw": {"feature": "pinch", "range": [2, 10], "invert": True}}}})
+    )
+    hand = synthesize_hand(0.5, 0.6, 1.0, 5)
+    controller.tracker.DETECTION_RESULT = FakeResult(hand_frame(hand))
+    controller.update_servos_values()
+
+    pinch = np.linalg.norm(hand[4] - hand[8]) * 10
+    assert controller.servos_values["claw"] == int(np.interp(pinch, [2, 10], [170, 100]))
+
+
+def test_register_feature():
+    FeatureExtractor.register("thumb_z", lambda hand: hand.world[4, 2], default_range=[-0.05, 0.05])
+    try:
+        config = Config.from_dict({"control": {"mapping": {"base": {"feature": "thumb_z"}}}})
+        assert config.control.mapping["base"].invert is False
+    finally:
+        del FeatureExtractor.FEATURES["thumb_z"]
+        del FeatureExtractor.DEFAULT_RANGES["thumb_z"]
+
+
+def test_invalid_mapping():
+    with pytest.raises(ValueError):
+        Config.from_dict({"control": {"mapping": {"claw": {"feature": "elbow"}}}})
+    with pytest.raises(ValueError):
+        Config.from_dict({"control": {"mapping": {"wrist": {"feature": "wrist_roll"}}}})
+    with pytest.raises(ValueError):
+        FeatureExtractor(["depth"])
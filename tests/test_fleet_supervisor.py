@@ -0,0 +1,80 @@
+import time
+import threading
+
+from helpers import FakeBoard, FakePin
+from src.control.FleetSupervisor import ArmWorker, FleetSupervisor
+
+
+class FlakyPin(FakePin):
+    def write(self, value) -> None:
+        if self.board.unplugged:
+            raise OSError("device disconnected")
+        super().write(value)
+
+
+class FlakyBoard(FakeBoard):
+    """FakeBoard failing like a serial port once unplugged"""
+
+    def __init__(self, port: str = None) -> None:
+        super().__init__(port)
+        self.unplugged = False
+
+    def get_pin(self, definition: str) -> FlakyPin:
+        return FlakyPin(self, int(definition.split(":")[1]))
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_reconnect_after_os_error():
+    boards = []
+
+    def board_factory(port):
+        boards.append(FlakyBoard(port))
+        return boards[-1]
+
+    worker = ArmWorker("fake0", board_factory=board_factory, min_backoff=0.01)
+    worker.start()
+    try:
+        wait_until(lambda: worker.state == ArmWorker.CONNECTED)
+
+        # The write fails, the worker closes the board and connects again
+        boards[0].unplugged = True
+        worker.submit(80, 120, 130, 150)
+        wait_until(lambda: len(boards) == 2 and worker.state == ArmWorker.CONNECTED)
+        assert worker.reconnects == 1
+
+        # The pose submitted before the failure is not replayed, the new ones are applied
+        assert boards[1].writes == [(2, 60), (3, 110), (4, 120), (5, 135)]
+        worker.submit(80, 120, 130, 150)
+        wait_until(lambda: (2, 80) in boards[1].writes)
+    finally:
+        worker.stop()
+        worker.join(timeout=2)
+    assert worker.state == ArmWorker.STOPPED
+
+
+def test_broadcast_during_discovery():
+    supervisor = FleetSupervisor(board_factory=FakeBoard, ports=[])
+    done = threading.Event()
+
+    def discovery():
+        for index in range(50):
+            supervisor.ports = supervisor.ports + ["fake{}".format(index)]
+            supervisor.discover()
+        done.set()
+
+    thread = threading.Thread(target=discovery)
+    thread.start()
+    try:
+        while not done.is_set():
+            supervisor.broadcast(80, 120, 130, 150)
+            supervisor.states()
+    finally:
+        thread.join()
+        supervisor.stop()
+    assert len(supervisor.states()) == 50
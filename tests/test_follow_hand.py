@@ -0,0 +1,164 @@
+import os
+import json
+import time
+
+import numpy as np
+import pytest
+
+from helpers import FIXTURES_DIR, FakeResult, load_frames, synthesize_hand
+from src.utils.Config import Config
+from src.utils.Metrics import metrics
+
+GOLDEN = os.path.join(FIXTURES_DIR, "follow_hand_golden.json")
+
+# Mean cost of follow_hand per frame, in ms, above which the test fails
+FRAME_BUDGET_MS = float(os.environ.get("ROBOARM_FRAME_BUDGET_MS", "1.0"))
+
+
+def replay(controller, clock, board, frames):
+    """
+    Feed the frames to follow_hand.
+
+    Returns:
+        tuple: Servo writes of each frame and the time spent in follow_hand, in seconds.
+    """
+    results = [FakeResult(frame) if "landmarks" in frame else None for frame in frames]
+    writes = []
+    elapsed = 0.0
+    for frame, result in zip(frames, results):
+        clock.advance(frame["dt"])
+        controller.tracker.DETECTION_RESULT = result
+        board.writes.clear()
+        start = time.perf_counter()
+        controller.follow_hand()
+        elapsed += time.perf_counter() - start
+        writes.append([list(write) for write in board.writes])
+    return writes, elapsed
+
+
+def test_initial_pose(controller, board):
+    assert board.writes == [(2, 60), (3, 110), (4, 120), (5, 135)]
+
+
+def test_golden_servo_commands(controller, clock, board):
+    writes, _ = replay(controller, clock, board, load_frames())
+
+    # Regenerate after an intended behaviour change with ROBOARM_UPDATE_GOLDEN=1
+    if os.environ.get("ROBOARM_UPDATE_GOLDEN"):
+        with open(GOLDEN, "w") as f:
+            json.dump({"writes": writes}, f)
+        pytest.skip("golden servo commands updated")
+
+    with open(GOLDEN) as f:
+        golden = json.load(f)["writes"]
+    assert len(writes) == len(golden)
+    for index, (actual, expected) in enumerate(zip(writes, golden)):
+        assert actual == expected, "frame {}".format(index)
+
+
+def test_tracking_sequence(controller, clock, board):
+    frames = load_frames()
+    writes, _ = replay(controller, clock, board, frames)
+
+    # Nothing is written before the hand is acquired
+    assert not any(writes[:10])
+    # The arm follows the hand and homes once it is gone
+    assert any(writes[10:70])
+    assert controller.tracking.state == controller.tracking.LOST
+    assert [servo.read() for servo in controller.controller.servos.values()] == [60, 110, 120, 135]
+
+
+def test_frame_cost(controller, clock, board):
+    frames = load_frames()
+    # The first pass warms up the caches, the best of the next passes is kept
+    replay(controller, clock, board, frames)
+    cost_ms = min(replay(controller, clock, board, frames)[1] for _ in range(5)) * 1000 / len(frames)
+
+    assert cost_ms < FRAME_BUDGET_MS, "follow_hand costs {:.3f} ms per frame".format(cost_ms)
+
+
+def test_tracking_hysteresis_config(controller, clock, board):
+    controller.apply_config(
+        Config.from_dict({"control": {"coast_time": 0.2, "min_confidence": 0.9, "reacquire_frames": 1}})
+    )
+    assert controller.tracking.coast_time == 0.2
+    assert controller.tracking.keep_confidence == 0.5
+
+    frames = load_frames()
+    hand = next(frame for frame in frames if "landmarks" in frame)
+    # Below min_confidence the hand is not acquired, a single confident frame is enough
+    replay(controller, clock, board, [dict(hand, score=0.8)])
+    assert controller.tracking.state == controller.tracking.LOST
+    replay(controller, clock, board, [dict(hand, score=0.95)])
+    assert controller.tracking.state == controller.tracking.TRACKING
+
+    with pytest.raises(ValueError):
+        Config.from_dict({"control": {"min_confidence": 0.4, "keep_confidence": 0.5}})
+
+
+def still_hand(x, seconds, fps=30):
+    hand = synthesize_hand(x, 0.6, 1.0, 5)
+    frame = {"dt": 1 / fps, "landmarks": hand.tolist(), "handedness": "Right", "score": 0.95}
+    return [frame] * int(seconds * fps)
+
+
+def test_gesture_modes_disabled_by_default(controller, clock, board):
+    replay(controller, clock, board, still_hand(0.5, 2))
+    assert controller.mode == "follow"
+
+    writes, _ = replay(controller, clock, board, still_hand(0.3, 0.2))
+    assert any(writes)
+
+
+def test_hold_locks_until_the_hand_is_lost(controller, clock, board):
+    controller.apply_config(Config.from_dict({"control": {"gesture_modes": {"hold": "locked"}}}))
+    replay(controller, clock, board, still_hand(0.5, 2))
+    assert controller.mode == "locked"
+
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    controller.draw_info(image)
+    assert image.any()
+
+    # The locked arm ignores the hand
+    writes, _ = replay(controller, clock, board, still_hand(0.3, 0.2))
+    assert not any(writes)
+
+    # Losing the hand homes the arm and restores the follow mode
+    replay(controller, clock, board, [{"dt": 1 / 30}] * 90)
+    assert controller.tracking.state == controller.tracking.LOST
+    assert controller.mode == "follow"
+
+    with pytest.raises(ValueError):
+        Config.from_dict({"control": {"gesture_modes": {"wave": "locked"}}})
+
+
+def test_homing_writes_saved(controller, clock, board):
+    # The Base servo is still on its way to 140 when the homing starts
+    controller.tracking.state = controller.tracking.HOMING
+    controller._legacy_homed = False  # First frame of the loss
+    controller.controller.control_servo("Base", 140)
+    controller.tracker.DETECTION_RESULT = None
+    saved = metrics.get("homing_writes_saved_total")
+    board.writes.clear()
+
+    clock.advance(0.02)
+    controller.follow_hand()
+    assert board.writes == []
+    assert metrics.get("homing_writes_saved_total") - saved == 1
+
+
+def test_homing_writes_saved_over_a_loss(controller, clock, board):
+    frames = still_hand(0.3, 0.5)
+    replay(controller, clock, board, frames)
+    assert controller.tracking.state == controller.tracking.TRACKING
+    away = sum(
+        servo.read() != controller.controller.home_angle(name) for name, servo in controller.controller.servos.items()
+    )
+    assert away > 0
+
+    # The previous behaviour re-initialized the servos on the first frame of the loss only
+    saved = metrics.get("homing_writes_saved_total")
+    writes, _ = replay(controller, clock, board, [{"dt": 1 / 30}] * 10)
+    assert controller.tracking.state == controller.tracking.COASTING
+    assert not any(writes)
+    assert metrics.get("homing_writes_saved_total") - saved == away
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from helpers import synthesize_hand
+from src.model import LandmarkCodec
+from src.model.LandmarkCodec import LandmarkDecoder, LandmarkEncoder
+
+EPOCH_MS = 1792397214097
+
+
+def test_keyframe_round_trip():
+    hand = synthesize_hand(0.4, 0.6, 1.0, 3)
+    data = LandmarkCodec.pack_frame(hand, LandmarkCodec.LEFT, EPOCH_MS)
+    assert len(data) == LandmarkCodec.KEYFRAME_SIZE
+
+    landmarks, handedness, timestamp_ms = LandmarkCodec.unpack_frame(data)
+    assert handedness == LandmarkCodec.LEFT
+    assert timestamp_ms == EPOCH_MS
+    np.testing.assert_allclose(landmarks, hand, atol=0.5 / LandmarkCodec.SCALE)
+
+
+@pytest.mark.parametrize(
+    "step, encoding, size",
+    [
+        (3 / LandmarkCodec.SCALE, LandmarkCodec.DELTA4, LandmarkCodec.DELTA4_SIZE),
+        (-7 / LandmarkCodec.SCALE, LandmarkCodec.DELTA4, LandmarkCodec.DELTA4_SIZE),
+        (100 / LandmarkCodec.SCALE, LandmarkCodec.DELTA8, LandmarkCodec.DELTA8_SIZE),
+        (-120 / LandmarkCodec.SCALE, LandmarkCodec.DELTA8, LandmarkCodec.DELTA8_SIZE),
+        (0.05, LandmarkCodec.KEYFRAME, LandmarkCodec.KEYFRAME_SIZE),
+    ],
+)
+def test_delta_round_trip(step, encoding, size):
+    encoder, decoder = LandmarkEncoder(), LandmarkDecoder()
+    hand = synthesize_hand(0.5, 0.6, 1.0, 5)
+    decoder.decode(encoder.encode(hand, LandmarkCodec.RIGHT, EPOCH_MS))
+
+    for index in range(1, 4):
+        moved = hand + step * index
+        data = encoder.encode(moved, LandmarkCodec.RIGHT, EPOCH_MS + 33 * index)
+        assert data[0] & 0x03 == encoding
+        assert len(data) == size
+
+        # The decoder reconstructs exactly the quantized landmarks, without accumulating errors
+        landmarks, handedness, timestamp_ms = decoder.decode(data)
+        np.testing.assert_array_equal(landmarks, LandmarkCodec.dequantize(LandmarkCodec.quantize(moved)))
+        assert handedness == LandmarkCodec.RIGHT
+        assert timestamp_ms == EPOCH_MS + 33 * index
+
+
+def test_keyframes():
+    encoder = LandmarkEncoder(keyframe_interval=2)
+    hand = synthesize_hand(0.5, 0.6, 1.0, 5)
+    encodings = [encoder.encode(hand, timestamp_ms=EPOCH_MS + 33 * index)[0] & 0x03 for index in range(5)]
+    assert encodings == [LandmarkCodec.KEYFRAME, LandmarkCodec.DELTA4, LandmarkCodec.DELTA4, LandmarkCodec.KEYFRAME, LandmarkCodec.DELTA4]
+
+    # A time step longer than a byte needs a keyframe
+    assert encoder.encode(hand, timestamp_ms=EPOCH_MS + 1000)[0] & 0x03 == LandmarkCodec.KEYFRAME
+
+    with pytest.raises(ValueError):
+        LandmarkDecoder().decode(encoder.encode(hand, timestamp_ms=EPOCH_MS + 1033))
+
+
+def test_clip_round_trip():
+    hands = np.array([synthesize_hand(0.2 + 0.02 * index, 0.6, 1.0, index % 6) for index in range(30)])
+    handedness = np.arange(30) % 2
+    timestamps = EPOCH_MS + np.cumsum(np.full(30, 33))
+
+    landmarks, decoded_handedness, decoded_timestamps = LandmarkCodec.decode_clip(
+        LandmarkCodec.encode_clip(hands, handedness, timestamps)
+    )
+    np.testing.assert_array_equal(landmarks, LandmarkCodec.dequantize(LandmarkCodec.quantize(hands)))
+    np.testing.assert_array_equal(decoded_handedness, handedness)
+    np.testing.assert_array_equal(decoded_timestamps, timestamps)
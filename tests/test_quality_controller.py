@@ -0,0 +1,81 @@
+import pytest
+
+from src.model.QualityController import QualityController
+
+BUDGET = 0.1
+
+
+@pytest.fixture
+def cpu(monkeypatch):
+    """CPU usage returned by measure_cpu, set by the tests"""
+    usage = {"value": 0.1}
+    monkeypatch.setattr(QualityController, "measure_cpu", lambda self: usage["value"])
+    return usage
+
+
+def run(controller, latency, start, end):
+    """Feed a constant latency every second and return the (time, level) of the changes"""
+    changes = []
+    for now in range(start, end):
+        if controller.update(latency, now=now) is not None:
+            changes.append((now, controller.level))
+    return changes
+
+
+def make(**kwargs):
+    return QualityController(BUDGET, start_level=2, smoothing=1.0, interval=1.0, upgrade_delay=10.0, **kwargs)
+
+
+def test_step_down(cpu):
+    controller = make()
+    assert run(controller, 0.2, 0, 3) == [(1, 3), (2, 4)]
+    # The cheapest level is kept
+    assert run(controller, 0.2, 3, 6) == []
+    assert controller.current() == controller.levels[-1]
+
+
+def test_step_down_on_cpu(cpu):
+    controller = make()
+    cpu["value"] = 0.9
+    assert run(controller, 0.01, 0, 2) == [(1, 3)]
+
+
+def test_step_up_after_delay(cpu):
+    controller = make()
+    assert run(controller, 0.05, 0, 15) == [(10, 1)]
+
+
+def test_dead_band(cpu):
+    # Between 0.7 and 1.0 times the budget the level holds in both directions
+    controller = make()
+    assert run(controller, 0.08, 0, 60) == []
+
+    cpu["value"] = 0.7
+    assert run(controller, 0.01, 60, 120) == []
+
+
+def test_back_off(cpu):
+    controller = make()
+    assert run(controller, 0.05, 0, 11) == [(10, 1)]
+
+    # The upgrade does not hold, the next one waits twice as long
+    assert run(controller, 0.2, 11, 12) == [(11, 2)]
+    assert run(controller, 0.05, 12, 40) == [(31, 1)]
+
+    # And four times as long after a second failure
+    assert run(controller, 0.2, 40, 41) == [(40, 2)]
+    assert run(controller, 0.05, 41, 200) == [(80, 1), (120, 0)]
+
+    # Once an upgrade held for twice the delay, the next one waits the initial delay again
+    assert run(controller, 0.2, 200, 201) == [(200, 1)]
+    assert run(controller, 0.05, 201, 241) == [(240, 0)]
+    assert run(controller, 0.2, 241, 242) == [(241, 1)]
+    assert run(controller, 0.05, 242, 270) == [(261, 0)]
+
+def test_bounded_history(cpu):
+    controller = make(max_history=3)
+    for cycle in range(5):
+        run(controller, 0.2, cycle * 100, cycle * 100 + 2)
+        run(controller, 0.05, cycle * 100 + 2, cycle * 100 + 100)
+    assert len(controller.history) == 3
+    assert controller.history[-1][0] > 400
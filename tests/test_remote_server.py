@@ -0,0 +1,67 @@
+import time
+import asyncio
+
+from src.control.RemoteServer import (
+    STATE_WATCHDOG,
+    RemoteClient,
+    RemoteServer,
+    pack_pose,
+)
+from src.control.RoboArm import RoboArm
+from src.utils.Metrics import metrics
+
+POSE = [80, 120, 130, 150]
+HOME = [60, 110, 120, 135]
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        await asyncio.sleep(0.005)
+
+
+def angles(arm):
+    return [servo.read() for servo in arm.servos.values()]
+
+
+async def scenario(board):
+    arm = RoboArm(board)
+    server = RemoteServer(arm, watchdog_timeout=0.2, state_rate=100, homing_speed=600)
+    await server.start(port=0)
+    client = RemoteClient(*server.address)
+    loop = asyncio.get_running_loop()
+    try:
+        # A pose is applied, duplicated and older sequence numbers are dropped
+        dropped = metrics.get("remote_packets_out_of_order_total")
+        client.sock.sendto(pack_pose(5, *POSE), server.address)
+        client.sock.sendto(pack_pose(5, 100, 100, 100, 100), server.address)
+        client.sock.sendto(pack_pose(4, 100, 100, 100, 100), server.address)
+        await wait_until(lambda: metrics.get("remote_packets_out_of_order_total") - dropped == 2)
+        await wait_until(lambda: angles(arm) == POSE)
+
+        # The subscribers receive the estimated state of the arm
+        client.subscribe()
+        sequence, _, state, flags = await loop.run_in_executor(None, client.receive_state)
+        assert sequence > 0
+        assert all(60 <= angle <= 170 for angle in state)
+        assert not flags & STATE_WATCHDOG
+
+        # Without poses the watchdog homes the arm
+        await wait_until(lambda: angles(arm) == HOME)
+        # Skip the state packets queued before the watchdog tripped
+        for _ in range(100):
+            _, _, state, flags = await loop.run_in_executor(None, client.receive_state)
+            if flags & STATE_WATCHDOG:
+                break
+        assert flags & STATE_WATCHDOG
+    finally:
+        client.close()
+        server.stop()
+
+
+def test_remote_server(board):
+    trips = metrics.get("remote_watchdog_trips_total")
+    asyncio.run(scenario(board))
+    assert metrics.get("remote_watchdog_trips_total") - trips == 1
@@ -0,0 +1,109 @@
+import pytest
+
+from src.control.RoboArm import RoboArm
+from src.utils.Config import ArmConfig
+from src.utils.Metrics import metrics
+
+
+def test_initial_pose(clock, board):
+    RoboArm(board)
+    assert board.writes == [(2, 60), (3, 110), (4, 120), (5, 135)]
+
+
+def test_limits(clock, board):
+    arm = RoboArm(board)
+    board.writes.clear()
+    clock.advance(1)
+
+    arm.control_servos(0, 180, 180, 0)
+    assert board.writes == [(2, 10), (3, 160), (4, 170), (5, 100)]
+
+
+def test_unchanged_angles_are_not_written(clock, board):
+    arm = RoboArm(board)
+    board.writes.clear()
+    clock.advance(1)
+
+    arm.control_servos(60, 110, 120, 135)
+    arm.control_servos(61, 110, 120, 135)
+    assert board.writes == [(2, 61)]
+
+
+def test_height_reach_coupling(clock, board):
+    arm = RoboArm(board)
+    board.writes.clear()
+    clock.advance(1)
+
+    # Height is raised to keep the claw above the base: -0.75 * 110 + 165 = 82.5
+    arm.control_servos(60, 110, 70, 135)
+    assert board.writes == [(4, 82.5)]
+
+    # Reach is limited by the settled Height: (82.5 - 165) / -0.75 = 110
+    board.writes.clear()
+    clock.advance(1)
+    arm.control_servos(60, 60, 82.5, 135)
+    assert board.writes == []
+
+
+def satisfies_coupling(arm):
+    reach, height = arm.servos["Reach"].read(), arm.servos["Height"].read()
+    return height >= -0.75 * reach + 165 - 1e-9 and reach >= (height - 165) / -0.75 - 1e-9
+
+
+def test_coupling_while_moving(clock, board):
+    arm = RoboArm(board)
+    clock.advance(1)
+    board.writes.clear()
+
+    # Reach retracts from 110 to 60: Height is bounded by the Reach command, not by where Reach still is
+    arm.control_servos(60, 60, 70, 135)
+    assert board.writes == [(3, 60)]
+    assert arm.servos["Height"].read() == 120
+    assert satisfies_coupling(arm)
+
+    # Reach extends again: Height only goes down once Reach is out of the way
+    clock.advance(1)
+    board.writes.clear()
+    arm.control_servos(60, 160, 70, 135)
+    assert board.writes == [(3, 160)]
+    assert satisfies_coupling(arm)
+
+    clock.advance(1)
+    arm.control_servos(60, 160, 70, 135)
+    assert board.writes == [(3, 160), (4, 70)]
+    assert satisfies_coupling(arm)
+
+
+def test_home_step(clock, board):
+    arm = RoboArm(board)
+    clock.advance(1)
+    arm.control_servos(10, 110, 120, 100)
+    board.writes.clear()
+
+    steps = []
+    while True:
+        clock.advance(0.1)
+        pending = arm.home_step(20)
+        steps.append(pending)
+        if pending == 0:
+            break
+
+    assert board.writes == [(2, 30), (5, 120), (2, 50), (5, 135), (2, 60)]
+    assert steps == [2, 2, 1, 0]
+
+
+def test_apply_config_clamps_angles(clock, board):
+    arm = RoboArm(board)
+    board.writes.clear()
+    clock.advance(1)
+
+    config = ArmConfig()
+    config.servos["Base"].limits = [70, 140]
+    arm.apply_config(config)
+    assert board.writes == [(2, 70)]
+
+
+def test_control_servos_is_timed(clock, board):
+    arm = RoboArm(board)
+    arm.control_servos(60, 110, 120, 135)
+    assert "robo_arm_control_servos_seconds_count" in metrics.render()
@@ -0,0 +1,32 @@
+import numpy as np
+
+from helpers import load_frames
+from src import soak
+from src.model import LandmarkCodec
+
+
+def test_memory_bounded(tmp_path, capsys):
+    hands = [frame["landmarks"] for frame in load_frames() if "landmarks" in frame]
+    clip = tmp_path / "clip.bin"
+    clip.write_bytes(
+        LandmarkCodec.encode_clip(np.array(hands), np.full(len(hands), LandmarkCodec.RIGHT), np.arange(len(hands)) * 33)
+    )
+
+    # 30 simulated seconds after the warm-up, a leak of a few bytes per frame exceeds the bound
+    bounded = soak.soak(
+        str(clip),
+        hours=40 / 3600,
+        interval=10,
+        warmup=10,
+        max_growth=0.05,
+        image_shape=(120, 160),
+        trace_frames=1,
+    )
+    out = capsys.readouterr().out
+    assert bounded, out
+
+    # The 1 s gaps between the passes over the clip are longer than the 0.5 s coast time
+    counts = dict(
+        item.rsplit(" ", 1) for item in out.split("Updates per tracking state: ")[1].splitlines()[0].split(", ")
+    )
+    assert int(counts["coasting"]) > 0 and int(counts["homing"]) > 0
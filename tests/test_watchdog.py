@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from src.control.RoboArm import RoboArm
+from src.control.Watchdog import Watchdog
+from src.utils.Config import ArmConfig
+
+
+@pytest.fixture
+def arm(clock, board):
+    config = ArmConfig()
+    config.servos["Base"].max_speed = 100
+    arm = RoboArm(board, config)
+    clock.advance(1)
+    board.writes.clear()
+    return arm
+
+
+def test_speed_limit(arm, clock, board):
+    # From rest, the first step is limited to MAX_STEP_TIME at 100 deg/s
+    arm.control_servo("Base", 120)
+    assert board.writes == [(2, 65.0)]
+    assert arm.servos["Base"].target == 120
+
+    # The watchdog completes the motion with its own timing
+    watchdog = Watchdog(arm, period=0.02)
+    watchdog.feed(clock.now)
+    for _ in range(30):
+        clock.advance(0.02)
+        watchdog.feed(clock.now)
+        watchdog.check(clock.now)
+    steps = [value for _, value in board.writes]
+    assert steps[-1] == 120
+    assert all(0 < b - a <= 2 + 1e-9 for a, b in zip(steps, steps[1:]))
+
+
+def test_stall_homes_the_arm(arm, clock, board):
+    watchdog = Watchdog(arm, max_command_age=0.5, homing_speed=60, period=0.02)
+    arm.control_servos(60, 150, 160, 100)
+    clock.advance(1)
+    watchdog.feed(clock.now)
+
+    clock.advance(0.4)
+    board.writes.clear()
+    watchdog.check(clock.now)
+    assert not watchdog.tripped and board.writes == []
+
+    with watchdog.stage("capture"):
+        clock.advance(0.2)
+        watchdog.check(clock.now)
+
+    assert watchdog.tripped
+    report = watchdog.stalls[-1]
+    assert report["running"] == ["capture"]
+    assert report["stages"]["capture"] == pytest.approx(0.2)
+    assert report["command_age"] == pytest.approx(0.6)
+    # Homing by steps of 60 deg/s * 0.02 s
+    assert board.writes == [(3, 149), (4, 159), (5, 101)]
+
+    for _ in range(200):
+        clock.advance(0.02)
+        watchdog.check(clock.now)
+    assert arm.servos["Reach"].read() == 110 and arm.servos["Claw"].read() == 135
+
+    watchdog.feed(clock.now)
+    watchdog.check(clock.now)
+    assert not watchdog.tripped
+
+
+def test_stall_stops_the_arm(arm, clock, board):
+    watchdog = Watchdog(arm, max_command_age=0.5, action=Watchdog.STOP)
+    watchdog.feed(clock.now)
+
+    # Reach moves from 110 to 160 at 300 deg/s and the pipeline hangs half way
+    arm.control_servo("Reach", 160)
+    clock.advance(1 / 12)
+    board.writes.clear()
+    watchdog.check(clock.now + 0.5)
+    assert watchdog.tripped
+    assert board.writes == [(3, 135)]
+
+    board.writes.clear()
+    watchdog.check(clock.now + 0.6)
+    assert board.writes == []
+
+
+def test_hung_control_path(arm, clock, board):
+    lock = threading.Lock()
+    watchdog = Watchdog(arm, lock=lock, max_command_age=0.5, period=0.01)
+    arm.control_servo("Claw", 100)
+    clock.advance(1)
+    watchdog.feed(clock.now)
+    board.writes.clear()
+
+    with lock:
+        clock.advance(1)
+        watchdog.check(clock.now)
+    assert watchdog.tripped
+    assert board.writes != []
+
+
+def test_busy_lock_skips_the_advance(arm, clock, board):
+    lock = threading.Lock()
+    watchdog = Watchdog(arm, lock=lock, period=0.02)
+    arm.control_servo("Base", 120)
+    watchdog.feed(clock.now)
+    board.writes.clear()
+
+    # A slow control update holds the lock, the healthy path never writes concurrently
+    with lock:
+        clock.advance(0.02)
+        watchdog.check(clock.now)
+    assert board.writes == []
+    assert not watchdog.tripped
+
+    watchdog.check(clock.now)
+    assert board.writes == [(2, pytest.approx(67))]